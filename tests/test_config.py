@@ -0,0 +1,89 @@
+import datetime
+import pytest
+from xc0424.config import decode_config, encode_config, write_config, MODES, SECONDS
+from xc0424.fake import FakeDevice, make_memory
+from xc0424.image import CONFIG_ADDR
+from xc0424.transport import Transport, CMD_SEGMENTS
+
+# The configuration bytes of make_memory(): cyclic, 24h, C, LCD auto off, 8 seconds, no offsets
+CONFIG = bytes((0x2d, 0x00, 0x08, 0x00, 100, 20))
+
+SETTINGS = [
+    {},
+    {'mode': 'acyclic', 'interval': 60, 'unit': 'F'},
+    {'mode': 'segmented', 'interval': 60 * 240, 'lcd_auto_off': False, 'time_display': 12, 'date': 'MD'},
+    {'temp_offset': -10.0, 'hum_offset': 20},
+    {'temp_offset': 10, 'hum_offset': -20},
+    {'temp_offset': 0.3, 'hum_offset': 0, 'interval': 8},
+] + [{'interval': interval} for interval in SECONDS]
+
+@pytest.mark.parametrize('settings', SETTINGS)
+def test_round_trip(settings):
+    config = encode_config(CONFIG, settings)
+    expected = decode_config(CONFIG)
+    expected.update(settings)
+    assert decode_config(config) == expected
+    # and back again
+    assert encode_config(CONFIG, decode_config(config)) == config
+
+def test_interval_msb():
+    # The msb of the interval is kept out of the setting
+    config = bytes((0x2d, 0x80, 0x08, 0x00, 100, 20))
+    assert decode_config(config)['interval'] == 8
+    assert encode_config(config, {})[1:3] == b'\x00\x08'
+
+@pytest.mark.parametrize('settings', [
+    {'interval': 60.0}, {'interval': '60'}, {'interval': True}, {'interval': 7}, {'interval': 90}, {'interval': 60 * 241},
+    {'hum_offset': 1.5}, {'hum_offset': 21}, {'hum_offset': None},
+    {'temp_offset': '1'}, {'temp_offset': 10.1}, {'temp_offset': False},
+    {'time_display': 24.0}, {'time_display': 13},
+    {'mode': ['cyclic']}, {'mode': 'Cyclic'}, {'date': 12}, {'date': 'YMD'}, {'unit': 'K'}, {'unit': 1},
+    {'lcd_auto_off': 1}, {'lcd_auto_off': 'yes'},
+    {'colour': 'red'},
+    # segment times only go with segmented mode, and have to be up to 4 start and end times
+    {'segments': [['2023-05-18T00:00', '2023-05-18T01:00']]},
+    {'mode': 'cyclic', 'segments': [['2023-05-18T00:00', '2023-05-18T01:00']]},
+    {'mode': 'segmented', 'segments': '2023-05-18T00:00'},
+    {'mode': 'segmented', 'segments': [['2023-05-18T00:00']]},
+    {'mode': 'segmented', 'segments': [[202305180000, 202305180100]]},
+    {'mode': 'segmented', 'segments': [['2023-05-18T00:00', 'tomorrow']]},
+    {'mode': 'segmented', 'segments': [['2023-05-18T00:00', '2023-05-18T01:00']] * 5},
+])
+def test_rejected(settings):
+    with pytest.raises(ValueError):
+        encode_config(CONFIG, settings)
+
+def logger():
+    fake = FakeDevice(make_memory(blocks=10))
+    dev = Transport(fake)
+    dev.initialise()
+    return fake, dev
+
+def test_write_config():
+    fake, dev = logger()
+    now = datetime.datetime(2024, 1, 2, 3, 4, 5)
+    settings = {'mode': 'segmented', 'interval': 120, 'temp_offset': -1.5,
+                'segments': [['2024-01-02T06:00', '2024-01-02T07:00'], ['2024-01-03T06:00', '2024-01-03T07:30']]}
+    serial, changes = write_config(dev, settings, now=now)
+    assert serial == '12345678'
+    assert set(changes) == {'mode', 'interval', 'temp_offset', 'segments'}
+    assert decode_config(fake.memory[CONFIG_ADDR + 4:CONFIG_ADDR + 10]) == dict(decode_config(CONFIG), **{name: value for name, value in settings.items() if name != 'segments'})
+    assert fake.clock == now
+    # Both used, in the top of the first month
+    assert dev.send_command(CMD_SEGMENTS)[:10] == bytes.fromhex('24 31 02 06 00 24 01 02 07 00')
+    # Data cleared with the new segment times
+    assert fake.memory[0x58:0x58 + 10] == b'\xff' * 10
+    # Nothing written the second time
+    before = fake.transactions
+    assert write_config(dev, settings, now=now) == (serial, {})
+    assert fake.transactions - before == 2
+
+def test_write_config_rejected():
+    # A bad setting is found before anything is written
+    fake, dev = logger()
+    memory = bytes(fake.memory)
+    with pytest.raises(ValueError):
+        write_config(dev, {'interval': 60.0})
+    with pytest.raises(ValueError):
+        write_config(dev, {'mode': 'cyclic', 'segments': [['2024-01-02T06:00', '2024-01-02T07:00']]})
+    assert bytes(fake.memory) == memory and fake.clock is None
@@ -0,0 +1,102 @@
+import datetime
+import random
+import sqlite3
+import pytest
+from xc0424.db import open_db, open_db_readonly, summary, rollups, sync, SCHEMA_VERSION
+from xc0424.fake import FakeDevice, make_memory
+from xc0424.transport import Transport
+
+# Databases made by the original xc0424_data_sql.py (user_version 0)
+
+def old_db(path, rows):
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE data (datatime DATETIME, humidity INTEGER, temperature_C FLOAT)')
+    db.executemany('INSERT INTO data (datatime, humidity, temperature_C) VALUES (?,?,?)',
+                   [(f'\'{t:%Y-%m-%d %H:%M:%S}\'' if isinstance(t, datetime.datetime) else t, humid, temp) for t, humid, temp in rows])
+    db.commit()
+    db.close()
+
+def old_rows(count):
+    start = datetime.datetime(2023, 5, 17, 13, 45, 8)
+    return [(start + datetime.timedelta(seconds=8 * i), 50 + i % 7, 20.0 + i % 11 / 10) for i in range(count)]
+
+def dump(path):
+    db = sqlite3.connect(path)
+    try:
+        return db.execute('PRAGMA user_version').fetchone()[0], db.execute('SELECT * FROM data').fetchall()
+    finally:
+        db.close()
+
+def test_convert(tmp_path):
+    path = str(tmp_path / 'old.db')
+    rows = old_rows(3000)
+    old_db(path, rows)
+    db = open_db(path, '12345678')
+    assert db.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    assert db.execute('SELECT count(*) FROM data WHERE serial=?', ('12345678',)).fetchone()[0] == len(rows)
+    count, hum_mean, hum_min, hum_max, temp_mean, temp_min, temp_max = summary(db, '12345678', rows[0][0], rows[-1][0] + datetime.timedelta(seconds=1))
+    assert (count, hum_min, hum_max, temp_min, temp_max) == (len(rows), 50, 56, 20.0, 21.0)
+    db.close()
+
+@pytest.mark.parametrize('serial, bad', [(None, False), ('12345678', True)])
+def test_convert_refused(tmp_path, serial, bad):
+    # Without a serial, or with a time that doesn't convert, the old database is left as it was
+    path = str(tmp_path / 'old.db')
+    rows = old_rows(100)
+    if bad:
+        rows.append(('not a time', 50, 20.0))
+    old_db(path, rows)
+    before = dump(path)
+    with pytest.raises(ValueError):
+        open_db(path, serial)
+    assert dump(path) == before
+
+def test_readonly(tmp_path):
+    # xc0424_data_report.py only looks, an old database has to be converted by xc0424_data_sql.py
+    path = str(tmp_path / 'old.db')
+    old_db(path, old_rows(100))
+    before = dump(path)
+    with pytest.raises(ValueError):
+        open_db_readonly(path)
+    assert dump(path) == before
+    open_db(path, '12345678').close()
+    db = open_db_readonly(path)
+    assert db.execute('SELECT sum(count) FROM rollup_day').fetchone()[0] == 100
+    with pytest.raises(sqlite3.OperationalError):
+        db.execute('DELETE FROM data')
+    db.close()
+
+def samples_db(tmp_path):
+    dev = Transport(FakeDevice(make_memory()))
+    dev.initialise()
+    db = open_db(str(tmp_path / 'samples.db'), '12345678')
+    sync(db, dev, '12345678')
+    return db
+
+def brute_force(db, start, end):
+    return db.execute('SELECT count(*), avg(humidity), min(humidity), max(humidity), avg(temperature_C), min(temperature_C), max(temperature_C) '
+                      'FROM data WHERE time >= ? AND time < ?', (start, end)).fetchone()
+
+def close(a, b):
+    return a[0] == b[0] and all(x == pytest.approx(y) for x, y in zip(a[1:], b[1:]))
+
+@pytest.mark.parametrize('period, size', [('hour', 3600), ('day', 86400)])
+def test_rollups_and_summary(tmp_path, period, size):
+    # The rows for a range are each exactly the samples of their hour or day in the range, so
+    # they add up to summary() for the range
+    db = samples_db(tmp_path)
+    first, last = db.execute('SELECT min(time), max(time) FROM data').fetchone()
+    rand = random.Random(0)
+    for i in range(100):
+        start, end = sorted(rand.randint(first - 7200, last + 7200) for j in range(2))
+        rows = rollups(db, '12345678', period, start, end)
+        total = summary(db, '12345678', start, end)
+        assert close(total, brute_force(db, start, end))
+        assert sum(row[1] for row in rows) == total[0]
+        for row in rows:
+            assert row[1] and close(row[1:], brute_force(db, max(row[0], start), min(row[0] + size, end)))
+        if rows:
+            assert (min(row[3] for row in rows), max(row[4] for row in rows)) == total[2:4]
+    # Without a range every bucket is whole
+    assert sum(row[1] for row in rollups(db, '12345678', period)) == db.execute('SELECT count(*) FROM data').fetchone()[0]
+    db.close()
@@ -0,0 +1,214 @@
+import io
+import os
+import sqlite3
+import pytest
+from xc0424.blocks import MAP_START, BLOCKS, DATA_START, BLOCK_SIZE
+from xc0424.fake import FakeDevice, make_memory
+from xc0424.transport import Transport, CMD_SEGMENTS
+from xc0424.image import snapshot, read_serial, open_source, CONFIG_ADDR
+from xc0424.index import read_blocks_in_order
+from xc0424.export import write_csv, write_arrow, CSV_HEADER
+from xc0424.blockstore import BlockStore, RECORD
+from xc0424.archive import ArchiveWriter, open_archive
+from xc0424.db import open_db, sync, sync_pipelined
+from xc0424.cache import CachedTransport
+from xc0424.config import write_config
+from xc0424.errors import TransportError
+from xc0424.profile import Stats
+
+# Downloads from the simulated logger (xc0424/fake.py), run with python -m pytest from the top
+# directory. The memory starts nearly full so a few record() calls make cyclic mode wrap around.
+
+def logger(blocks=320, last=10, **kwargs):
+    fake = FakeDevice(make_memory(blocks=blocks, last=last), **kwargs)
+    dev = Transport(fake, backoff=0)
+    dev.initialise()
+    return fake, dev
+
+def samples(fake):
+    # Number of samples in the logger's memory
+    return sum(count + 1 for count in fake.memory[MAP_START:MAP_START + BLOCKS] if count != 0xff)
+
+def cached(fake, directory):
+    # A new run with the cache in directory
+    dev = CachedTransport(Transport(fake, backoff=0), directory)
+    dev.initialise()
+    return dev
+
+def csv(blocks):
+    out = io.StringIO()
+    write_csv(out, blocks)
+    return out.getvalue()
+
+def rows(path):
+    db = sqlite3.connect(path)
+    try:
+        return db.execute('SELECT serial, time, humidity, temperature_C FROM data ORDER BY time').fetchall()
+    finally:
+        db.close()
+
+def test_csv_device_and_image():
+    fake, dev = logger()
+    for count in (0, 200, 64 * 6):
+        fake.record(count)
+        text = csv(read_blocks_in_order(dev))
+        assert text == csv(read_blocks_in_order(snapshot(dev)))
+        # Oldest first and one row per sample, wrapped or not
+        times = [line.split(',')[0] for line in text.splitlines()[1:]]
+        assert times == sorted(times)
+        assert len(times) == len(set(times)) == samples(fake)
+
+def test_sql_sync_across_wrap(tmp_path):
+    # Syncing before and after the wrap keeps the overwritten samples as well, so the database
+    # ends up with every sample the logger ever had
+    fake, dev = logger()
+    serial = read_serial(dev)
+    path = str(tmp_path / 'sync.db')
+    expected = set()
+    for count in (0, 100, 64 * 5, 64 * 3 + 7):
+        fake.record(count)
+        full = str(tmp_path / ('full%d.db' % count))
+        db = open_db(full, serial)
+        sync(db, dev, serial, full=True)
+        db.close()
+        expected.update(rows(full))
+        db = open_db(path, serial)
+        sync(db, dev, serial)
+        db.close()
+        assert rows(path) == sorted(expected, key=lambda row: row[1])
+
+def test_sql_pipelined_matches_sync(tmp_path):
+    fake, dev = logger()
+    serial = read_serial(dev)
+    for count in (0, 64 * 5 + 3, 64 * 2):
+        fake.record(count)
+        for name, function in (('sync', sync), ('pipelined', sync_pipelined)):
+            db = open_db(str(tmp_path / (name + '.db')), serial)
+            function(db, dev, serial)
+            db.close()
+        assert rows(str(tmp_path / 'sync.db')) == rows(str(tmp_path / 'pipelined.db'))
+
+def test_archive_round_trip(tmp_path):
+    fake, dev = logger()
+    fake.record(64 * 6)
+    path = str(tmp_path / 'logger.xca')
+    with ArchiveWriter(path, read_serial(dev)) as archive:
+        archive.write_blocks(read_blocks_in_order(dev))
+    with open_archive(path) as archive:
+        assert csv(archive.read_blocks()) == csv(read_blocks_in_order(dev))
+
+def test_open_errors(tmp_path):
+    # The scripts turn these into an exit message
+    path = str(tmp_path / 'logger.xca')
+    with open(path, 'wb') as f:
+        f.write(b'not an archive')
+    for function in (open_archive, open_source):
+        with pytest.raises(ValueError):
+            function(path)
+        with pytest.raises(ValueError):
+            function(str(tmp_path / 'missing'))
+
+def test_stats_stages(tmp_path):
+    # Every output records the read, decode and storage stages for --stats
+    fake, dev = logger()
+    serial = read_serial(dev)
+    def archive(blocks, stats):
+        with ArchiveWriter(str(tmp_path / 'logger.xca'), serial) as archive:
+            archive.write_blocks(blocks, stats)
+    def parquet(blocks, stats):
+        pytest.importorskip('pyarrow')
+        write_arrow(str(tmp_path / 'logger.parquet'), serial, blocks, 'parquet', stats)
+    for write in (lambda blocks, stats: write_csv(io.StringIO(), blocks, stats), archive, parquet):
+        stats = Stats()
+        write(read_blocks_in_order(dev), stats)
+        assert set(stats.stages) == {'read', 'decode', 'storage'}
+        assert stats.stages['decode']['count'] == 320
+
+def test_cache_across_wrap(tmp_path):
+    # A block overwritten between runs is full both times, the cache must not give its old header
+    fake, dev = logger()
+    for count in (0, 64 * 5, 64 * 3, 64 * 320, 64 * 2 + 5):
+        fake.record(count)
+        cache = cached(fake, str(tmp_path))
+        assert csv(read_blocks_in_order(cache)) == csv(read_blocks_in_order(dev))
+        cache.save()
+
+def test_cache_sync_across_wrap(tmp_path):
+    fake, dev = logger()
+    serial = read_serial(dev)
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'b').mkdir()
+    for count in (0, 100, 64 * 5, 64 * 3 + 7, 64 * 200):
+        fake.record(count)
+        for name, function, source in (('full', sync, dev), ('cached', sync, cached(fake, str(tmp_path / 'a'))),
+                                       ('pipelined', sync_pipelined, cached(fake, str(tmp_path / 'b')))):
+            db = open_db(str(tmp_path / (name + '.db')), serial)
+            function(db, source, serial)
+            db.close()
+            if source is not dev:
+                source.save()
+        assert rows(str(tmp_path / 'cached.db')) == rows(str(tmp_path / 'full.db'))
+        assert rows(str(tmp_path / 'pipelined.db')) == rows(str(tmp_path / 'full.db'))
+
+def test_cache_acyclic(tmp_path):
+    # Without cyclic mode the headers of blocks that haven't changed come from the cache
+    memory = make_memory(blocks=100, last=10)
+    memory[CONFIG_ADDR + 4] &= ~0x18
+    fake = FakeDevice(memory)
+    dev = Transport(fake)
+    for count in (0, 64 * 3, 20):
+        fake.record(count)
+        cache = cached(fake, str(tmp_path))
+        before = fake.transactions
+        text = csv(read_blocks_in_order(cache))
+        cached_reads = fake.transactions - before
+        cache.save()
+        before = fake.transactions
+        assert text == csv(read_blocks_in_order(dev))
+        assert cached_reads <= fake.transactions - before
+    assert cached_reads < fake.transactions - before
+
+def test_cache_segments(tmp_path):
+    # Writing just the segment times leaves the configuration as it was
+    memory = make_memory()
+    memory[CONFIG_ADDR + 4] = memory[CONFIG_ADDR + 4] & ~0x18 | 0x10
+    fake = FakeDevice(memory)
+    for times in ([['2024-01-02T03:04', '2024-01-02T05:06']], [['2024-02-03T04:05', '2024-02-03T06:07']]):
+        dev = Transport(fake)
+        dev.initialise()
+        write_config(dev, {'segments': times})
+        cache = cached(fake, str(tmp_path))
+        assert cache.send_command(CMD_SEGMENTS) == dev.send_command(CMD_SEGMENTS)
+        cache.save()
+
+def test_pipelined_reads_with_errors():
+    # With several reads in flight a lost or corrupt response must not leave the responses after
+    # it paired with the wrong reads, the bytes have to be the logger's or it has to fail
+    for depth in (1, 2, 4, 8):
+        for seed in range(10):
+            fake, dev = logger(error_rate=0.05, seed=seed)
+            dev.depth = depth
+            try:
+                data = dev.read_memory(DATA_START, 64 * BLOCK_SIZE)
+            except TransportError:
+                continue
+            assert data == bytes(fake.memory[DATA_START:DATA_START + 64 * BLOCK_SIZE])
+
+def test_block_store(tmp_path):
+    # Exporting only what isn't in the store each time gives every sample once, the last block
+    # growing between exports included, and the store keeps each sample once
+    fake, dev = logger()
+    store = BlockStore.open(str(tmp_path), read_serial(dev))
+    exported = []
+    everything = set()
+    for count in (0, 20, 64 * 2 + 3, 1, 64 * 6):
+        fake.record(count)
+        exported += csv(store.new_blocks(read_blocks_in_order(dev))).splitlines()[1:]
+        store.commit()
+        everything.update(csv(read_blocks_in_order(dev)).splitlines()[1:])
+        assert len(exported) == len(set(exported))
+        assert set(exported) == everything
+        assert os.path.getsize(store.path) == len(everything) * 3 + len(store) * RECORD.size
+        assert csv(store.read_blocks()).splitlines()[1:] == sorted(everything)
+    assert csv(store.new_blocks(read_blocks_in_order(dev))) == CSV_HEADER
+    assert csv(BlockStore.open(str(tmp_path), read_serial(dev)).read_blocks()).splitlines()[1:] == sorted(everything)
@@ -0,0 +1,35 @@
+import datetime
+import random
+from xc0424.blocks import read_blocks, HEADER_START, HEADER_SIZE
+from xc0424.fake import FakeDevice, make_memory, header_bytes
+from xc0424.index import BlockIndex
+from xc0424.image import snapshot
+from xc0424.transport import Transport
+from xc0424.archive import ArchiveWriter, Archive
+
+def test_clock_set_back(tmp_path):
+    # A block logged at a long interval after the clock was set back overlaps the blocks after it
+    # in time, so their end times aren't in order. A time range has to give the same samples as
+    # reading every block.
+    memory = make_memory(blocks=40)
+    starttime = datetime.datetime(2023, 5, 17, 14, 0, 0)
+    memory[HEADER_START + 10 * HEADER_SIZE:HEADER_START + 11 * HEADER_SIZE] = header_bytes(starttime, 600)
+    memory[HEADER_START + 11 * HEADER_SIZE:HEADER_START + 12 * HEADER_SIZE] = header_bytes(starttime + datetime.timedelta(minutes=5), 8)
+    dev = Transport(FakeDevice(memory))
+    dev.initialise()
+    image = snapshot(dev)
+    index = BlockIndex(image)
+    path = str(tmp_path / 'logger.xca')
+    with ArchiveWriter(path, image.serial) as archive:
+        archive.write_blocks(read_blocks(image))
+    archive = Archive(path)
+    first, last = index.starts[0], max(index.ends)
+    rand = random.Random(0)
+    for i in range(200):
+        start, end = sorted(first + datetime.timedelta(seconds=rand.uniform(-600, (last - first).total_seconds() + 600)) for j in range(2))
+        expected = sorted((starttime, block, bytes(data)) for block, starttime, interval, data in read_blocks(image, start=start, end=end))
+        got = sorted((starttime, block, bytes(data)) for block, starttime, interval, data in index.read_blocks(image, start, end))
+        assert got == expected
+        assert sorted((starttime, bytes(data)) for block, starttime, interval, data in archive.read_blocks(start, end)) == [(starttime, data) for starttime, block, data in expected]
+        assert [entry[2] for entry in index.overlapping(start, end)] == [entry[2] for entry in index.entries if entry[1] > start and entry[0] < end]
+    archive.close()
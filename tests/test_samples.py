@@ -0,0 +1,59 @@
+import datetime
+import pytest
+from xc0424.blocks import read_samples, HEADER_START, HEADER_SIZE, DATA_START, BLOCK_SIZE
+from xc0424.fake import FakeDevice, make_memory, header_bytes
+from xc0424.image import snapshot
+from xc0424.store import SampleStore
+from xc0424.transport import Transport
+
+# The decoded sample containers (SampleStore, numpy arrays) against read_samples(), on a snapshot
+# of the simulated logger
+
+def image(blocks=6, last=10):
+    memory = make_memory(blocks=blocks, last=last)
+    if blocks > 3:
+        # A block at a different interval, and samples below 0C and 0%
+        memory[HEADER_START + 2 * HEADER_SIZE:HEADER_START + 3 * HEADER_SIZE] = header_bytes(datetime.datetime(2023, 5, 18, 9, 0, 0), 600)
+        memory[DATA_START + 3 * BLOCK_SIZE:DATA_START + 3 * BLOCK_SIZE + 6] = bytes((5, 0x01, 0x5f, 20, 0x01, 0xf3))
+    dev = Transport(FakeDevice(memory))
+    dev.initialise()
+    return snapshot(dev)
+
+def test_sample_store():
+    source = image()
+    expected = list(read_samples(source))
+    store = SampleStore.from_source(source)
+    assert len(store) == len(expected) == 5 * 64 + 11
+    assert list(store.samples()) == expected
+    assert [tuple(sample) for sample in store] == expected
+    assert [(sample.time, sample.humidity, sample.temp_c, sample.temp_f) for sample in store] == [
+        (time, humidity, temp_c, temp_c * 9 / 5 + 32) for time, humidity, temp_c in expected]
+    assert [sample[1:] for sample in expected[3 * 64:3 * 64 + 2]] == [(-15, -14.9), (0, -0.1)]
+    assert tuple(store[-1]) == expected[-1]
+    assert tuple(store[-len(store)]) == expected[0]
+    assert tuple(store[2 * 64]) == expected[2 * 64]
+    for index in (len(store), -len(store) - 1):
+        with pytest.raises(IndexError):
+            store[index]
+
+def test_sample_store_range():
+    source = image()
+    start = datetime.datetime(2023, 5, 17, 14, 0, 0)
+    end = datetime.datetime(2023, 5, 18, 10, 0, 0)
+    store = SampleStore.from_source(source, start=start, end=end)
+    expected = list(read_samples(source, start=start, end=end))
+    assert expected and len(expected) < len(list(read_samples(source)))
+    assert list(store.samples()) == expected
+    assert [tuple(sample) for sample in store] == expected
+
+def test_decode_blocks():
+    vector = pytest.importorskip('xc0424.vector')
+    for source in (image(), image(blocks=0)):
+        expected = list(read_samples(source))
+        samples = vector.decode_blocks(source)
+        assert all(len(column) == len(expected) for column in samples)
+        assert samples.time.tolist() == [time for time, humidity, temp_c in expected]
+        assert samples.humidity.tolist() == [humidity for time, humidity, temp_c in expected]
+        assert samples.temp_c.tolist() == [temp_c for time, humidity, temp_c in expected]
+        assert samples.temp_f.tolist() == [temp_c * 9 / 5 + 32 for time, humidity, temp_c in expected]
+    assert samples.time.dtype == 'datetime64[s]' and samples.humidity.dtype == 'int16'
@@ -0,0 +1,30 @@
+import pytest
+from xc0424.fake import FakeDevice
+from xc0424.transport import Transport, CMD_CONFIG
+from xc0424.errors import TransportError
+
+class ShortDevice(FakeDevice):
+    # Responses cut short after the first one
+    def read(self, endpoint, size_or_buffer, timeout=None):
+        length = super().read(endpoint, size_or_buffer, timeout)
+        return length if self.transactions < 2 else 8
+
+@pytest.mark.parametrize('checksum', [True, False])
+def test_short_response(checksum):
+    # What is left in the buffer from the last response must not be taken as data
+    dev = Transport(ShortDevice(), retries=0, checksum=checksum)
+    assert len(dev.send_command(CMD_CONFIG)) == 10
+    with pytest.raises(TransportError):
+        dev.send_command(CMD_CONFIG)
+
+def test_initialise_reads_config():
+    # The configuration comes with the init probe, until something is written
+    fake = FakeDevice()
+    dev = Transport(fake)
+    assert dev.initialise() == bytes(fake.memory[2:4])
+    assert dev.send_command(CMD_CONFIG) == bytes(fake.memory[5:15])
+    assert dev.read_memory(5, 4) == b'\x12\x34\x56\x78'
+    assert fake.transactions == 1
+    dev.send_command(b'\x00\x22' + bytes((0x25, 0x00, 0x10, 0x00, 100, 20)))
+    assert dev.send_command(CMD_CONFIG)[4:] == bytes((0x25, 0x00, 0x10, 0x00, 100, 20))
+    assert fake.transactions == 3
@@ -0,0 +1 @@
+# Shared code for the XC-0424 scripts
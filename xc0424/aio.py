@@ -0,0 +1,85 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from xc0424.transport import find_device, find_devices, Transport, CMD_CURRENT
+from xc0424.blocks import read_blocks, block_samples, decode_sample, SAMPLE
+from xc0424.image import CONFIG_ADDR, read_serial
+
+# asyncio wrapper around Transport. The blocking libusb calls run on a thread of the client's own
+# (one per logger, so its commands stay in order) and the event loop is free while they wait.
+#
+#   client = await AsyncClient.open()
+#   config = await client.read_config()
+#   async for time, humidity, temp_c in client.samples():
+#       ...
+
+class AsyncClient:
+    def __init__(self, transport, executor=None):
+        self.transport = transport
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='xc0424')
+
+    @classmethod
+    async def open(cls, device=None, **kwargs):
+        # The first logger found, or device. kwargs go to Transport.
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='xc0424')
+        if device is None:
+            device = await loop.run_in_executor(executor, find_device)
+        client = cls(Transport(device, **kwargs), executor)
+        # Possibly initialise
+        await client.run(client.transport.initialise)
+        return client
+
+    @classmethod
+    async def open_all(cls, **kwargs):
+        # A client for every attached logger
+        devices = await asyncio.get_running_loop().run_in_executor(None, find_devices)
+        return await asyncio.gather(*(cls.open(device, **kwargs) for device in devices))
+
+    async def run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def send_command(self, command):
+        return await self.run(self.transport.send_command, command)
+
+    async def read_memory(self, addr, length):
+        return await self.run(self.transport.read_memory, addr, length)
+
+    async def read_config(self):
+        # Same as 01 00 00 05 0a, serial (4 bytes) then the configuration (6 bytes)
+        return await self.read_memory(CONFIG_ADDR, 10)
+
+    async def read_serial(self):
+        return await self.run(read_serial, self.transport)
+
+    async def current(self):
+        # (humidity, temperature C) right now
+        response = await self.send_command(CMD_CURRENT)
+        return decode_sample(*SAMPLE.unpack_from(response))
+
+    async def blocks(self, walk=read_blocks, *args):
+        # Items from a block walker (read_blocks or another generator taking the transport first)
+        # stepped on the client's thread, so each one is yielded as soon as it has been read
+        done = object()
+        it = await self.run(walk, self.transport, *args)
+        while True:
+            item = await self.run(next, it, done)
+            if item is done:
+                return
+            yield item
+
+    async def samples(self, **kwargs):
+        # (time, humidity, temperature C) block by block while the download is still going.
+        # skip, limit, start and end as for read_blocks.
+        async for block, starttime, interval, data in self.blocks(functools.partial(read_blocks, **kwargs)):
+            for sample in block_samples(data, starttime, interval):
+                yield sample
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
@@ -0,0 +1,204 @@
+import bisect
+import calendar
+import datetime
+import itertools
+import struct
+from xc0424.blocks import SAMPLE, encode_header, sample_range
+from xc0424.profile import timer, timed
+
+# Archive file, the samples of any number of blocks (from one logger) in a quarter or less of
+# the space of the logger's own 3 byte samples:
+#
+#   magic, version, serial (4 bytes)
+#   the blocks, each one:
+#     the 8 byte block header as on the logger (start time and interval), number of samples (2 bytes)
+#     the first sample as on the logger (3 bytes)
+#     then for each following sample the change in temperature and humidity (zigzag encoded so
+#     small negative changes are small numbers) as one varint of temperature << 4 | humidity,
+#     with humidity 15 meaning the humidity change follows as a varint of its own. No change
+#     (0) is followed by a varint of how many more samples are the same. Readings change
+#     slowly, so a sample is mostly one byte or less.
+#   index, one entry per block in start time order: start time (seconds of the logger's clock),
+#     interval, number of samples, logger block number and the offset of the block in the file
+#   footer: offset of the index, number of blocks, end magic
+#
+# So any time range is decoded by reading the footer and index and seeking to the blocks in it.
+
+MAGIC = b'XC0424AR'
+END_MAGIC = b'XC0424IX'
+VERSION = 1
+FILE_HEADER = struct.Struct('<8sB4s')
+BLOCK_HEADER = struct.Struct('<8sH')
+INDEX_ENTRY = struct.Struct('<qHHHQ')
+FOOTER = struct.Struct('<QI8s')
+EPOCH = datetime.datetime(1970, 1, 1)
+
+def zigzag(n):
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+def unzigzag(n):
+    return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+def put_varint(out, n):
+    while n >= 0x80:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+def get_varint(data, pos):
+    n = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7f) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+def encode_block(data):
+    # The samples after the first as deltas, see above
+    out = bytearray(data[:3])
+    samples = SAMPLE.iter_unpack(data)
+    last_humid, last_temp = next(samples, (0, 0))
+    repeats = 0
+    for humid, temp in samples:
+        if humid == last_humid and temp == last_temp:
+            repeats += 1
+            continue
+        if repeats:
+            put_varint(out, 0)
+            put_varint(out, repeats - 1)
+            repeats = 0
+        dh = zigzag(humid - last_humid)
+        put_varint(out, zigzag(temp - last_temp) << 4 | min(dh, 15))
+        if dh >= 15:
+            put_varint(out, dh - 15)
+        last_humid, last_temp = humid, temp
+    if repeats:
+        put_varint(out, 0)
+        put_varint(out, repeats - 1)
+    return out
+
+def decode_block(data, count):
+    # Back to count samples of 3 bytes as the logger stores them
+    if not count:
+        return b''
+    out = bytearray(data[:3])
+    humid, temp = SAMPLE.unpack(data[:3])
+    pos = 3
+    while len(out) < count * 3:
+        n, pos = get_varint(data, pos)
+        if n == 0:
+            repeats, pos = get_varint(data, pos)
+            out += SAMPLE.pack(humid, temp) * (repeats + 1)
+            continue
+        dh = n & 0x0f
+        if dh == 15:
+            dh, pos = get_varint(data, pos)
+            dh += 15
+        humid += unzigzag(dh)
+        temp += unzigzag(n >> 4)
+        out += SAMPLE.pack(humid, temp)
+    return bytes(out)
+
+
+class ArchiveWriter:
+    def __init__(self, path, serial):
+        self.f = open(path, 'wb')
+        self.index = []
+        self.f.write(FILE_HEADER.pack(MAGIC, VERSION, bytes.fromhex(serial) if isinstance(serial, str) else bytes(serial)))
+
+    def add(self, block, starttime, interval, data, stats=None):
+        # A block of raw samples, (block, starttime, interval, data) as from read_blocks
+        count = len(data) // 3
+        if not count:
+            return
+        # Encoding is timed as the decode stage, like turning the samples into CSV or Arrow
+        with timer(stats, 'decode'):
+            encoded = encode_block(data)
+        with timer(stats, 'storage'):
+            self.index.append((calendar.timegm(starttime.timetuple()), interval, count, block, self.f.tell()))
+            self.f.write(BLOCK_HEADER.pack(encode_header(starttime, interval), count))
+            self.f.write(encoded)
+
+    def write_blocks(self, blocks, stats=None):
+        for block, starttime, interval, data in timed(stats, 'read', blocks):
+            self.add(block, starttime, interval, data, stats)
+
+    def close(self):
+        offset = self.f.tell()
+        self.index.sort()
+        for entry in self.index:
+            self.f.write(INDEX_ENTRY.pack(*entry))
+        self.f.write(FOOTER.pack(offset, len(self.index), END_MAGIC))
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Archive:
+    def __init__(self, path):
+        self.f = open(path, 'rb')
+        try:
+            magic, version, serial = FILE_HEADER.unpack(self.f.read(FILE_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError("%s: not an XC-0424 archive" % path)
+            if version != VERSION:
+                raise ValueError("%s: unsupported archive version %d" % (path, version))
+            self.f.seek(-FOOTER.size, 2)
+            offset, blocks, end_magic = FOOTER.unpack(self.f.read(FOOTER.size))
+            if end_magic != END_MAGIC:
+                raise ValueError("%s: truncated archive" % path)
+            self.f.seek(offset)
+            self.index = list(INDEX_ENTRY.iter_unpack(self.f.read(blocks * INDEX_ENTRY.size)))
+        except (struct.error, OSError) as e:
+            self.f.close()
+            raise ValueError("%s: not an XC-0424 archive (%s)" % (path, e))
+        except ValueError:
+            self.f.close()
+            raise
+        self.serial = serial
+        # The latest end time so far, blocks can overlap if the logger's clock has been set back
+        self.ends = list(itertools.accumulate((start + interval * count for start, interval, count, block, offset in self.index), max))
+
+    @property
+    def serial_str(self):
+        return self.serial.hex().upper()
+
+    def read_blocks(self, start=None, end=None):
+        # (block, starttime, interval, data) oldest first with data as the logger's 3 byte samples,
+        # like read_blocks. Only the blocks with samples from start up to end are read.
+        lo = 0 if start is None else bisect.bisect_right(self.ends, calendar.timegm(start.timetuple()))
+        for first_time, interval, count, block, offset in self.index[lo:]:
+            starttime = EPOCH + datetime.timedelta(seconds=first_time)
+            if end is not None and starttime >= end:
+                break
+            self.f.seek(offset)
+            header, count = BLOCK_HEADER.unpack(self.f.read(BLOCK_HEADER.size))
+            # A sample is at most 5 bytes (3 for the temperature, 2 more for a big humidity change)
+            # and a run of repeats at most 2
+            data = decode_block(self.f.read(3 + (count - 1) * 5), count)
+            first, last = sample_range(starttime, interval, count, start, end)
+            if first >= last:
+                continue
+            yield block, starttime + datetime.timedelta(seconds=interval * first), interval, data[first * 3:last * 3]
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_archive(path):
+    # Archive for a script, raises ValueError with the message if it can't be opened or read
+    try:
+        return Archive(path)
+    except OSError as e:
+        raise ValueError(str(e)) from e
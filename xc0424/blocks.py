@@ -0,0 +1,92 @@
+import datetime
+import struct
+
+# Memory layout
+MAP_START = 0x0058          # One byte per block, ff is empty otherwise the number of samples - 1
+MAP_END = 0x019c
+HEADER_START = 0x019c       # 8 bytes per block, start date and time plus the interval
+HEADER_SIZE = 8
+DATA_START = 0x0d00         # 0x40 samples of 3 bytes per block
+BLOCK_SIZE = 0x40 * 3
+BLOCKS = MAP_END - MAP_START
+
+# humidity + 20, temperature * 10 + 500 (big endian)
+SAMPLE = struct.Struct('>BH')
+HUMIDITY_OFFSET = 20
+TEMP_OFFSET = 500
+
+def decode_sample(humid, temp):
+    # (humidity, temperature C) of a stored sample or the current reading (01 01 02), also works
+    # on numpy arrays.
+    # Need to take 20 because 0 in data allows for -20 offset
+    # Need to take 500 from temp because 0 in data is -40.0C plus -10.0C offset
+    return humid - HUMIDITY_OFFSET, (temp - TEMP_OFFSET) / 10
+
+def fahrenheit(temp_c):
+    return temp_c * 9 / 5 + 32
+
+def date_hex(datedec):
+    # The dates are stored as hex but are decimal (ie 2023/05/15 is stored as 0x23 0x05 0x15)
+    return ((datedec & 0xf0) >> 4) * 10 + (datedec & 0x0f)
+
+def block_header(datadate):
+    # 8 byte block header: yy mm dd HH MM SS then the interval in seconds (2 bytes)
+    starttime = datetime.datetime(date_hex(datadate[0]) + 2000, date_hex(datadate[1]), date_hex(datadate[2]),
+                                  date_hex(datadate[3]), date_hex(datadate[4]), date_hex(datadate[5]))
+    interval = (datadate[6] * 0x100) + datadate[7]
+    return starttime, interval
+
+def encode_header(starttime, interval):
+    # The other way, block_header(encode_header(t, i)) == (t, i) for 2000 to 2099
+    return bytes.fromhex(starttime.strftime('%y %m %d %H %M %S')) + bytes((interval >> 8, interval & 0xff))
+
+def used_blocks(map):
+    # ff in the map is an empty block
+    return [block for block in range(BLOCKS) if map[block] != 0xff]
+
+def read_blocks(source, skip=0, limit=None, start=None, end=None):
+    # source is anything with read_memory(addr, length), ie a Transport or an Image.
+    # Yields (block, starttime, interval, data) for the used blocks in memory order, each one as
+    # soon as it has been read. skip and limit count used blocks. start and end (datetimes) keep
+    # only the samples from start up to (not including) end, blocks outside that are not read at all.
+    map = source.read_memory(MAP_START, BLOCKS)
+    used = used_blocks(map)[skip:]
+    if limit is not None:
+        used = used[:limit]
+    if not used:
+        return
+    headers = source.read_memory(HEADER_START + used[0] * HEADER_SIZE, (used[-1] - used[0] + 1) * HEADER_SIZE)
+    for block in used:
+        offset = (block - used[0]) * HEADER_SIZE
+        starttime, interval = block_header(headers[offset:offset + HEADER_SIZE])
+        # map is the number of samples - 1 and there are 3 bytes per sample
+        first, count = sample_range(starttime, interval, map[block] + 1, start, end)
+        if first >= count:
+            continue
+        data = source.read_memory(DATA_START + block * BLOCK_SIZE + first * 3, (count - first) * 3)
+        yield block, starttime + datetime.timedelta(seconds=interval * first), interval, data
+
+def sample_range(starttime, interval, count, start=None, end=None):
+    # (first, last + 1) of the samples of a block that are from start up to end
+    first = 0
+    if start is not None and start > starttime:
+        first = min(count, -(-(start - starttime).total_seconds() // interval))
+    if end is not None and end > starttime:
+        count = min(count, -(-(end - starttime).total_seconds() // interval))
+    elif end is not None:
+        count = 0
+    return int(first), int(count)
+
+def block_samples(data, starttime, interval):
+    # Yields (time, humidity, temperature C) for a block of raw samples
+    time_change = datetime.timedelta(seconds=interval)
+    for humid, temp in SAMPLE.iter_unpack(data):
+        yield (starttime,) + decode_sample(humid, temp)
+        starttime += time_change
+
+def read_samples(source, skip=0, limit=None, start=None, end=None):
+    # Yields (time, humidity, temperature C) for every sample, decoded straight from the
+    # data buffers (memoryviews when the source is a MappedImage). The samples come out block by
+    # block as they are read, skip, limit, start and end are as for read_blocks.
+    for block, starttime, interval, data in read_blocks(source, skip, limit, start, end):
+        yield from block_samples(data, starttime, interval)
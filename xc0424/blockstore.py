@@ -0,0 +1,133 @@
+import datetime
+import hashlib
+import os
+import struct
+from xc0424.blocks import block_header, encode_header
+
+# Per logger store of every block seen (xc0424_<serial>.blocks in the store directory), each one
+# kept once under a hash of its 8 byte header and data. Between two downloads almost all the
+# full blocks are the same, so exporting only the blocks not in the store skips them:
+#
+#   store = BlockStore.open(directory, serial)
+#   write_csv(out, store.new_blocks(read_blocks_in_order(source)))
+#   store.commit()
+#
+# The last block grows between downloads, when it is already stored with fewer samples only the
+# new samples are given and stored. Blocks given by new_blocks() are only added by commit(), so
+# call that once they have been written out (or committed to the database): if anything goes
+# wrong first they are given again next time. The blocks have to be whole, as they are on the
+# logger, not cut down to a time range.
+#
+# The file is records of hash (16 bytes, of the whole block so far), header (8 bytes), first
+# sample, number of samples, then those samples as on the logger. A record with a first sample
+# other than 0 adds to the longest record of that header. It is only ever appended to.
+
+RECORD = struct.Struct('<16s8sBB')
+
+def fingerprint(header, data):
+    return hashlib.blake2b(bytes(header) + bytes(data), digest_size=16).digest()
+
+
+class BlockStore:
+    def __init__(self, path):
+        self.path = path
+        # hash: (header, [(offset of the data in the file, number of samples)...]) the parts
+        # of the block, oldest first
+        self.blocks = {}
+        # header: hash of the longest block with that header
+        self.latest = {}
+        self.pending = {}
+        self.load()
+
+    @classmethod
+    def open(cls, directory, serial):
+        os.makedirs(directory, exist_ok=True)
+        return cls(os.path.join(directory, 'xc0424_' + serial + '.blocks'))
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        pos = 0
+        while pos + RECORD.size <= len(data):
+            digest, header, first, count = RECORD.unpack_from(data, pos)
+            if pos + RECORD.size + count * 3 > len(data):
+                break
+            self.remember(digest, header, first, pos + RECORD.size, count)
+            pos += RECORD.size + count * 3
+        if pos != len(data):
+            # The end of a write that didn't finish
+            with open(self.path, 'r+b') as f:
+                f.truncate(pos)
+
+    def remember(self, digest, header, first, offset, count):
+        parts = []
+        if first:
+            # Added to the longest one so far
+            latest = self.latest.get(header)
+            if latest is None or self.count(latest) != first:
+                return
+            parts = self.blocks[latest][1]
+        self.blocks[digest] = (header, parts + [(offset, count)])
+        latest = self.latest.get(header)
+        if latest is None or self.count(latest) < first + count:
+            self.latest[header] = digest
+
+    def count(self, digest):
+        # Number of samples in a stored block
+        return sum(count for offset, count in self.blocks[digest][1])
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __contains__(self, digest):
+        return digest in self.blocks
+
+    def read_data(self, digest):
+        data = bytearray()
+        with open(self.path, 'rb') as f:
+            for offset, count in self.blocks[digest][1]:
+                f.seek(offset)
+                data += f.read(count * 3)
+        return bytes(data)
+
+    def new_blocks(self, blocks):
+        # (block, starttime, interval, data) from blocks that aren't in the store, for a block
+        # that is stored with fewer samples just the samples after those
+        for block, starttime, interval, data in blocks:
+            data = bytes(data)
+            header = encode_header(starttime, interval)
+            digest = fingerprint(header, data)
+            if digest in self.blocks or digest in self.pending:
+                continue
+            first = 0
+            latest = self.latest.get(header)
+            if latest is not None:
+                known = self.read_data(latest)
+                if data.startswith(known):
+                    first = len(known) // 3
+            if first * 3 < len(data):
+                yield block, starttime + datetime.timedelta(seconds=interval * first), interval, data[first * 3:]
+            self.pending[digest] = (header, first, data[first * 3:])
+
+    def commit(self):
+        # Add the blocks given by new_blocks() since the last commit
+        if not self.pending:
+            return
+        with open(self.path, 'ab') as f:
+            for digest, (header, first, data) in self.pending.items():
+                offset = f.tell() + RECORD.size
+                f.write(RECORD.pack(digest, header, first, len(data) // 3))
+                f.write(data)
+                self.remember(digest, header, first, offset, len(data) // 3)
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending = {}
+
+    def read_blocks(self):
+        # Every stored block (block is None, the store doesn't keep where it was on the
+        # logger) oldest first, a grown block only in its longest form
+        for header, digest in sorted(self.latest.items(), key=lambda item: block_header(item[0])):
+            starttime, interval = block_header(header)
+            yield None, starttime, interval, self.read_data(digest)
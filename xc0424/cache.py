@@ -0,0 +1,125 @@
+import json
+import os
+from xc0424.blocks import MAP_START, MAP_END, BLOCKS, HEADER_START, HEADER_SIZE
+from xc0424.config import MODE_MASK, MODES
+
+# Per logger cache (xc0424_<serial>.cache in the cache directory) of the block headers, which
+# rarely change. The configuration read by Transport.initialise() is checked against the cache:
+#   - the map is always read, a block header is used from the cache while the configuration and
+#     the block's map byte are the same
+#   - the first block's header is read with the map (it fits in the same reads) and if it has
+#     changed the data has been cleared since, so none of the cached headers are used
+#   - in cyclic mode no cached headers are used at all. Once the memory has wrapped around a
+#     block can be overwritten between two runs and be full both times, and block 0's header
+#     only changes once per wrap.
+# Everything else goes to the logger.
+
+HEADER_END = HEADER_START + BLOCKS * HEADER_SIZE
+
+class CachedTransport:
+    def __init__(self, dev, directory='.'):
+        self.dev = dev
+        self.directory = directory
+        self.config = None
+        self.path = None
+        self.map = None
+        # The map byte of each block when its header was read, ff if it hasn't been
+        self.known = bytearray(b'\xff' * BLOCKS)
+        self.headers = bytearray(BLOCKS * HEADER_SIZE)
+
+    def __getattr__(self, name):
+        # Anything else is the Transport's
+        return getattr(self.dev, name)
+
+    def initialise(self):
+        # Possibly initialise
+        response = self.dev.initialise()
+        config = self.config = bytes(self.dev.config)
+        self.path = os.path.join(self.directory, 'xc0424_' + config[:4].hex().upper() + '.cache')
+        cache = self.load()
+        cyclic = config[4] & MODE_MASK == MODES['cyclic']
+        if cache and cache.get('known') and bytes.fromhex(cache['config']) == config and not cyclic:
+            self.known[:] = bytes.fromhex(cache['known'])
+            self.headers[:] = bytes.fromhex(cache['headers'])
+        return response
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self):
+        cache = {'config': self.config.hex(),
+                 'known': self.known.hex(),
+                 'headers': self.headers.hex()}
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp, self.path)
+
+    def send_command(self, command):
+        # Memory reads (01 00 addr len) of anything cached come from the cache, the rest go to
+        # the Transport as they are
+        command = bytes(command)
+        if len(command) == 5 and command[:2] == b'\x01\x00':
+            addr = (command[2] << 8) | command[3]
+            if self.cached(addr, addr + command[4]):
+                return self.read_memory(addr, command[4])
+        return self.dev.send_command(command)
+
+    def read_command(self, addr, size):
+        return self.send_command((0x01, 0x00, addr >> 8, addr & 0xff, size))
+
+    def cached(self, start, end):
+        # Whether any of start to end is cached
+        return start < HEADER_END and end > MAP_START
+
+    def read_memory(self, addr, length):
+        # Split into the parts that might be cached and the rest
+        data = bytearray()
+        end = addr + length
+        while addr < end:
+            if MAP_START <= addr < MAP_END:
+                part = min(end, MAP_END)
+                data += self.read_map()[addr - MAP_START:part - MAP_START]
+            elif HEADER_START <= addr < HEADER_END:
+                part = min(end, HEADER_END)
+                data += self.read_headers(addr - HEADER_START, part - HEADER_START)
+            else:
+                # Up to the next cached part
+                part = min([end] + [start for start in (MAP_START, HEADER_START) if start > addr])
+                data += self.dev.read_memory(addr, part - addr)
+            addr = part
+        return bytes(data)
+
+    def read_map(self):
+        # Once per run, it is what says which cached headers are still good
+        if self.map is None:
+            data = self.dev.read_memory(MAP_START, BLOCKS + HEADER_SIZE)
+            self.map = data[:BLOCKS]
+            if data[BLOCKS:] != self.headers[:HEADER_SIZE]:
+                self.known[:] = b'\xff' * BLOCKS
+            self.headers[:HEADER_SIZE] = data[BLOCKS:]
+            self.known[0] = self.map[0]
+        return self.map
+
+    def read_headers(self, start, end):
+        # Headers from start to end (offsets from HEADER_START), reading only the blocks that
+        # have changed since they were cached
+        map = self.read_map()
+        block = start // HEADER_SIZE
+        last = -(-end // HEADER_SIZE)
+        while block < last:
+            if map[block] != 0xff and map[block] == self.known[block]:
+                block += 1
+                continue
+            # A run of blocks to read
+            run = block + 1
+            while run < last and not (map[run] != 0xff and map[run] == self.known[run]):
+                run += 1
+            self.headers[block * HEADER_SIZE:run * HEADER_SIZE] = self.dev.read_memory(HEADER_START + block * HEADER_SIZE, (run - block) * HEADER_SIZE)
+            self.known[block:run] = map[block:run]
+            block = run
+        return bytes(self.headers[start:end])
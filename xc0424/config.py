@@ -0,0 +1,210 @@
+import json
+import os
+import tomllib
+from datetime import datetime
+from xc0424.transport import CMD_CONFIG, CMD_SEGMENTS, CMD_CLEAR
+from xc0424.errors import TransportError
+
+# The logger configuration as settings rather than bits, and writing it from a settings file.
+#
+# The configuration is 6 bytes (the last 6 of the 01 00 00 05 0a response):
+#   flags, interval (2 bytes, seconds, the msb is sometimes set), temperature offset * 10 + 100 (2 bytes),
+#   humidity offset + 20
+#
+# A settings file (TOML or JSON) has the settings for every logger under default and the ones
+# for a particular logger under its serial number, anything not given is left as it is:
+#
+#   [default]
+#   mode = "cyclic"             # acyclic, cyclic or segmented
+#   interval = 60               # 8,16,24,32,40,48,56 seconds or 1 to 240 minutes
+#   lcd_auto_off = true
+#   time_display = 24           # 12 or 24
+#   date = "DM"                 # DM or MD
+#   unit = "C"                  # C or F
+#   temp_offset = 0.0           # -10.0C to 10.0C
+#   hum_offset = 0              # -20 to 20
+#   segments = [["2023-05-18T00:00", "2023-05-18T01:00"]]   # up to 4 start/end times, segmented mode only
+#
+#   [loggers.12345678]
+#   interval = 8
+#
+# The values have to be the types shown, 60.0 is not an interval.
+
+LCD_AUTO_OFF = 0x20
+MODE_MASK = 0x18
+H24 = 0x04
+MD = 0x02
+C = 0x01
+
+MODES = {'acyclic': 0x00, 'cyclic': 0x08, 'segmented': 0x10}
+SECONDS = (8, 16, 24, 32, 40, 48, 56)
+SEGMENTS = 4
+
+TYPES = {'mode': str, 'interval': int, 'lcd_auto_off': bool, 'time_display': int, 'date': str,
+         'unit': str, 'temp_offset': (int, float), 'hum_offset': int, 'segments': (list, tuple)}
+TYPE_NAMES = {str: 'a string', int: 'a whole number', bool: 'true or false', (int, float): 'a number', (list, tuple): 'a list'}
+
+def decode_config(config):
+    # Settings from the 6 configuration bytes
+    flags = config[0]
+    modes = {bits: name for name, bits in MODES.items()}
+    return {
+        'mode': modes.get(flags & MODE_MASK, hex(flags & MODE_MASK)),
+        # The most significate bit of the interval can be set so remove it
+        'interval': ((config[1] & 0x7f) * 0x100) + config[2],
+        'lcd_auto_off': flags & LCD_AUTO_OFF == LCD_AUTO_OFF,
+        'time_display': 24 if flags & H24 else 12,
+        'date': 'MD' if flags & MD else 'DM',
+        'unit': 'C' if flags & C else 'F',
+        'temp_offset': (((config[3] * 0x100) + config[4]) - 100) / 10,
+        'hum_offset': config[5] - 20,
+    }
+
+def check_type(name, value, types):
+    # Settings files give floats and strings as easily as ints, bool is an int but never a number here
+    if isinstance(value, bool) != (types == bool) or not isinstance(value, types):
+        raise ValueError('%s %r is not %s' % (name, value, TYPE_NAMES[types]))
+
+def encode_config(config, settings):
+    # The 6 configuration bytes with settings replacing the current values, ValueError if any are invalid
+    flags = config[0]
+    interval = ((config[1] & 0x7f) * 0x100) + config[2]
+    tempoff = (config[3] * 0x100) + config[4]
+    humoff = config[5]
+    for name, value in settings.items():
+        if name in TYPES:
+            check_type(name, value, TYPES[name])
+        match name:
+            case 'mode':
+                if value not in MODES:
+                    raise ValueError('mode %r is not acyclic, cyclic or segmented' % value)
+                flags = flags & ~MODE_MASK | MODES[value]
+            case 'interval':
+                if not (value in SECONDS or (60 <= value <= 60 * 240 and value % 60 == 0)):
+                    raise ValueError('interval of %r is not 8, 16, 24, 32, 40, 48, 56 seconds or 1 to 240 minutes' % value)
+                interval = value
+            case 'lcd_auto_off':
+                flags = flags & ~LCD_AUTO_OFF | (LCD_AUTO_OFF if value else 0)
+            case 'time_display':
+                if value not in (12, 24):
+                    raise ValueError('time_display %r is not 12 or 24' % value)
+                flags = flags & ~H24 | (H24 if value == 24 else 0)
+            case 'date':
+                if value not in ('DM', 'MD'):
+                    raise ValueError('date %r is not DM or MD' % value)
+                flags = flags & ~MD | (MD if value == 'MD' else 0)
+            case 'unit':
+                if value not in ('C', 'F'):
+                    raise ValueError('unit %r is not C or F' % value)
+                flags = flags & ~C | (C if value == 'C' else 0)
+            case 'temp_offset':
+                if not -10.0 <= value <= 10.0:
+                    raise ValueError('temp_offset %r is not -10.0 to 10.0' % value)
+                # Stored as tenths with 0 being -10.0
+                tempoff = round(value * 10) + 100
+            case 'hum_offset':
+                if not -20 <= value <= 20:
+                    raise ValueError('hum_offset %r is not -20 to 20' % value)
+                # 0 stored is offset of -20
+                humoff = value + 20
+            case 'segments':
+                # Checked here so a bad one is found before anything is written
+                encode_segments(value)
+            case _:
+                raise ValueError('unknown setting %r' % name)
+    if 'segments' in settings and flags & MODE_MASK != MODES['segmented']:
+        raise ValueError('segments are only used in segmented mode')
+    return bytes((flags, (interval >> 8) & 0xff, interval & 0xff, (tempoff >> 8) & 0xff, tempoff & 0xff, humoff))
+
+def time_bytes(t):
+    # yy mm dd HH MM, the month is binary (the top of the first month holds the segment flags)
+    # and the rest decimal stored as hex (ie 2023/05/15 is 0x23 0x05 0x15)
+    return bytes.fromhex(t.strftime('%y ') + '%02x' % t.month + t.strftime(' %d %H %M'))
+
+def encode_segments(segments, now=None):
+    # The 40 bytes of segment times written with 00 04, unused ones are set to now
+    if len(segments) > SEGMENTS:
+        raise ValueError('only %d segment times' % SEGMENTS)
+    now = now or datetime.now()
+    times = bytearray()
+    for i in range(SEGMENTS):
+        if i < len(segments) and (not isinstance(segments[i], (list, tuple)) or len(segments[i]) != 2):
+            raise ValueError('segment %r is not a start and end time' % (segments[i],))
+        start, end = segments[i] if i < len(segments) else (now, now)
+        times += time_bytes(as_datetime(start)) + time_bytes(as_datetime(end))
+    # Which of the times are used is in the top of the first month
+    times[1] += sum(0x10 << i for i in range(len(segments)))
+    return bytes(times)
+
+def segments_match(current, wanted):
+    # Only the used times matter
+    flags = wanted[1] & 0xf0
+    if current[1] & 0xf0 != flags:
+        return False
+    for i in range(SEGMENTS):
+        if flags & (0x10 << i):
+            a = bytearray(current[i * 10:(i + 1) * 10])
+            b = bytearray(wanted[i * 10:(i + 1) * 10])
+            a[1] &= 0x0f if i == 0 else 0xff
+            b[1] &= 0x0f if i == 0 else 0xff
+            if a != b:
+                return False
+    return True
+
+def as_datetime(t):
+    if isinstance(t, datetime):
+        return t
+    if not isinstance(t, str):
+        raise ValueError('segment time %r is not a date and time' % (t,))
+    return datetime.fromisoformat(t)
+
+def load_settings(path):
+    # TOML if the file name ends in .toml, otherwise JSON
+    if os.path.splitext(path)[1] == '.toml':
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    with open(path) as f:
+        return json.load(f)
+
+def settings_for(spec, serial):
+    # default overridden by the logger's own settings
+    settings = dict(spec.get('default', {}))
+    settings.update(spec.get('loggers', {}).get(serial, {}))
+    return settings
+
+def write_config(dev, settings, dry_run=False, now=None):
+    # Apply settings to a logger (an initialised Transport). Returns (serial, changes) where
+    # changes is a dict of setting: (old, new), empty if the logger already matched and nothing
+    # was written. Setting segmented times clears the data like the logger's own software.
+    response = dev.send_command(CMD_CONFIG)
+    serial = response[:4].hex().upper()
+    current = bytes(response[4:10])
+    config = encode_config(current, settings)
+    old = decode_config(current)
+    new = decode_config(config)
+    changes = {name: (old[name], new[name]) for name in new if old[name] != new[name]}
+    # The msb of the interval is left out of the comparison, it isn't a setting
+    same = config == bytes((current[0], current[1] & 0x7f)) + current[2:]
+
+    segments = None
+    if new['mode'] == 'segmented' and 'segments' in settings:
+        segments = encode_segments(settings['segments'], now)
+        if not segments_match(dev.send_command(CMD_SEGMENTS), segments):
+            changes['segments'] = ('different', ' '.join('%s %s' % (start, end) for start, end in settings['segments']))
+        else:
+            segments = None
+    if same and segments is None:
+        return serial, {}
+    if dry_run:
+        return serial, changes
+
+    # Write current date and time (stored as hex but are decimal, ie 23 05 15)
+    dev.send_command(b'\x00\x11' + bytes.fromhex((now or datetime.now()).strftime('%y %m %d %H %M %S')))
+    response = dev.send_command(b'\x00\x22' + config)
+    if response[0] != 0xaa:
+        raise TransportError('configuration not accepted (%s)' % response.hex(' '))
+    if segments is not None:
+        # Write segmented times then clear data
+        dev.send_command(b'\x00\x04' + segments)
+        dev.send_command(CMD_CLEAR)
+    return serial, changes
@@ -0,0 +1,324 @@
+import calendar
+import pathlib
+import queue
+import sqlite3
+import threading
+import time
+from xc0424.blocks import SAMPLE, decode_sample
+from xc0424.sync import read_new_blocks
+from xc0424.index import BlockIndex
+from xc0424.profile import timer, timed
+from xc0424.errors import TransportError
+
+# sqlite3 database for the samples
+#
+# Version 0 (user_version 0) was data (datatime DATETIME, humidity INTEGER, temperature_C FLOAT) with
+# the time stored as a quoted string and no index. Version 1 stores the time as integer seconds and
+# has a unique index on (serial, time) so duplicates are skipped by INSERT OR IGNORE.
+#
+# Times are the logger's own clock (local time) as seconds since 1970-01-01 00:00, the same as
+# calendar.timegm() and sqlite's strftime('%s'), so there is nothing to go wrong with DST.
+#
+# Version 2 adds the hourly and daily rollups (rollup_hour and rollup_day): count, sum, minimum
+# and maximum of humidity and temperature for each serial and hour or day (bucket is the time
+# it starts). They are updated in the same transaction as the samples, for just the hours and
+# days that had new samples, so summaries over months don't have to read every sample.
+SCHEMA_VERSION = 2
+
+ROLLUPS = {'hour': ('rollup_hour', 3600), 'day': ('rollup_day', 86400)}
+
+# sync_pipelined() commits when a batch has this many rows or is this old (seconds)
+BATCH_ROWS = 5000
+BATCH_SECONDS = 2.0
+# Blocks read ahead of the database
+QUEUE_SIZE = 16
+
+def open_db(path, serial):
+    db = sqlite3.connect(path)
+    version = db.execute('PRAGMA user_version').fetchone()[0]
+    if version < SCHEMA_VERSION:
+        try:
+            migrate(db, serial, version)
+        except BaseException:
+            db.close()
+            raise
+    return db
+
+def open_db_readonly(path):
+    # For looking only, an old database is not converted (ValueError)
+    db = sqlite3.connect(pathlib.Path(path).resolve().as_uri() + '?mode=ro', uri=True)
+    version = db.execute('PRAGMA user_version').fetchone()[0]
+    if version < SCHEMA_VERSION:
+        db.close()
+        raise ValueError('%s is version %d of the database, run xc0424_data_sql.py on it first to convert it to version %d' % (path, version, SCHEMA_VERSION))
+    return db
+
+def migrate(db, serial, version):
+    # Old databases are for one logger (xc0424_<serial>.db) so the rows get that serial. Raises
+    # ValueError, with nothing changed, if any of the old sample times would be lost.
+    if serial is None:
+        raise ValueError('the serial number is needed to convert an old database')
+    db.execute('BEGIN')
+    try:
+        if version < 1:
+            old = db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='data'").fetchone()
+            if old:
+                db.execute('ALTER TABLE data RENAME TO data_v0')
+            db.execute('CREATE TABLE data (serial TEXT NOT NULL, time INTEGER NOT NULL, humidity INTEGER, temperature_C REAL)')
+            db.execute('CREATE UNIQUE INDEX data_serial_time ON data (serial, time)')
+            # Newest block read by the last run (see xc0424/sync.py)
+            db.execute('CREATE TABLE IF NOT EXISTS sync (serial TEXT PRIMARY KEY, block INTEGER, header BLOB, count INTEGER)')
+            if old:
+                # The old rows were only unique by time, humidity and temperature so a time is kept
+                # once (the first row), but every time has to make it including any that don't convert
+                old_times = "SELECT CAST(strftime('%s', trim(datatime, '''')) AS INTEGER) AS time, humidity, temperature_C FROM data_v0 WHERE datatime IS NOT NULL"
+                times = db.execute('SELECT count(DISTINCT time) + count(*) - count(time) FROM (' + old_times + ')').fetchone()[0]
+                converted = db.execute('INSERT OR IGNORE INTO data (serial, time, humidity, temperature_C) '
+                                       'SELECT ?, time, humidity, temperature_C FROM (' + old_times + ')', (serial,)).rowcount
+                if converted != times:
+                    raise ValueError('only %d of the %d sample times in the old database could be converted' % (converted, times))
+                db.execute('DROP TABLE data_v0')
+        if version < 2:
+            for table, seconds in ROLLUPS.values():
+                db.execute('CREATE TABLE %s (serial TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER, '
+                           'humidity_sum INTEGER, humidity_min INTEGER, humidity_max INTEGER, '
+                           'temperature_sum REAL, temperature_min REAL, temperature_max REAL, '
+                           'PRIMARY KEY (serial, bucket))' % table)
+            # For the samples already there
+            update_rollups(db)
+        db.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+    except BaseException:
+        db.rollback()
+        raise
+    db.commit()
+
+def block_rows(serial, data, starttime, interval):
+    # (serial, time, humidity, temperature C) rows for a block of raw samples
+    start = calendar.timegm(starttime.timetuple())
+    return [(serial, start + i * interval) + decode_sample(humid, temp)
+            for i, (humid, temp) in enumerate(SAMPLE.iter_unpack(data))]
+
+def update_rollups(db, serial=None, start=None, end=None):
+    # Work out the hours with samples from start to end (seconds, inclusive) again, then the
+    # days from the hours. All of them if serial is None.
+    where, params = '', ()
+    if serial is not None:
+        where = 'WHERE serial=? AND time >= ? AND time < ?'
+        params = (serial, start - start % 3600, end - end % 3600 + 3600)
+    db.execute('INSERT OR REPLACE INTO rollup_hour SELECT serial, time - time % 3600, count(*), '
+               'sum(humidity), min(humidity), max(humidity), sum(temperature_C), min(temperature_C), max(temperature_C) '
+               'FROM data ' + where + ' GROUP BY 1, 2', params)
+    if serial is not None:
+        where = 'WHERE serial=? AND bucket >= ? AND bucket < ?'
+        params = (serial, start - start % 86400, end - end % 86400 + 86400)
+    db.execute('INSERT OR REPLACE INTO rollup_day SELECT serial, bucket - bucket % 86400, sum(count), '
+               'sum(humidity_sum), min(humidity_min), max(humidity_max), sum(temperature_sum), min(temperature_min), max(temperature_max) '
+               'FROM rollup_hour ' + where + ' GROUP BY 1, 2', params)
+
+def span(rows, current=None):
+    # (first, last) time of rows (in time order) and current
+    if not rows:
+        return current
+    if current is None:
+        return rows[0][1], rows[-1][1]
+    return min(current[0], rows[0][1]), max(current[1], rows[-1][1])
+
+def commit(db, serial, times):
+    # The rollups for the samples added since the last commit go in the same transaction
+    if times is not None:
+        update_rollups(db, serial, *times)
+    db.commit()
+
+def insert_rows(db, rows):
+    # Returns the number of new rows, existing ones are skipped by the unique index
+    before = db.total_changes
+    db.executemany('INSERT OR IGNORE INTO data (serial, time, humidity, temperature_C) VALUES (?,?,?,?)', rows)
+    return db.total_changes - before
+
+def sync(db, source, serial, full=False, stats=None):
+    # Add the samples newer than the last sync (everything if full) in one transaction,
+    # returns the number of new rows
+    last = None
+    if not full:
+        last = db.execute('SELECT block, header, count FROM sync WHERE serial=?', (serial,)).fetchone()
+    inserted = 0
+    times = None
+    try:
+        for block, header, first, count, starttime, interval, data in timed(stats, 'read', read_new_blocks(source, last)):
+            with timer(stats, 'decode'):
+                rows = block_rows(serial, data, starttime, interval)
+            with timer(stats, 'storage'):
+                inserted += insert_rows(db, rows)
+                db.execute('INSERT OR REPLACE INTO sync (serial, block, header, count) VALUES (?,?,?,?)', (serial, block, header, count))
+                times = span(rows, times)
+    except TransportError:
+        # Keep the blocks read so far (and the high water mark that goes with them) so the
+        # next run carries on from the last good block
+        commit(db, serial, times)
+        raise
+    with timer(stats, 'storage'):
+        commit(db, serial, times)
+    return inserted
+
+def load_range(db, source, serial, start=None, end=None, stats=None):
+    # Add the samples from start up to end reading only the blocks in that time, the sync
+    # high water mark is left alone. Returns the number of new rows.
+    with timer(stats, 'index'):
+        index = BlockIndex(source)
+    return load_blocks(db, serial, index.read_blocks(source, start, end), stats)
+
+def load_blocks(db, serial, blocks, stats=None):
+    # Add the samples of blocks, (block, starttime, interval, data) as from read_blocks or an
+    # Archive, in one transaction. Returns the number of new rows.
+    inserted = 0
+    times = None
+    try:
+        for block, starttime, interval, data in timed(stats, 'read', blocks):
+            with timer(stats, 'decode'):
+                rows = block_rows(serial, data, starttime, interval)
+            with timer(stats, 'storage'):
+                inserted += insert_rows(db, rows)
+                times = span(rows, times)
+    except TransportError:
+        commit(db, serial, times)
+        raise
+    with timer(stats, 'storage'):
+        commit(db, serial, times)
+    return inserted
+
+def sync_pipelined(db, source, serial, full=False, stats=None, batch_rows=BATCH_ROWS, batch_seconds=BATCH_SECONDS, queue_size=QUEUE_SIZE):
+    # Same as sync() but the blocks are read from the logger on another thread while this one
+    # decodes and stores them, so the USB and disk waits overlap. Commits every batch_rows rows
+    # or batch_seconds, each with the high water mark of the rows in it, so a crash loses at
+    # most the last batch and the next run reads it again. Uses WAL so a commit is one write.
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    last = None
+    if not full:
+        last = db.execute('SELECT block, header, count FROM sync WHERE serial=?', (serial,)).fetchone()
+
+    blocks = queue.Queue(queue_size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        # Give up if the writer has
+        while not stop.is_set():
+            try:
+                blocks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def reader():
+        try:
+            for item in timed(stats, 'read', read_new_blocks(source, last)):
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(e)
+            return
+        put(done)
+
+    thread = threading.Thread(target=reader, name='xc0424-reader', daemon=True)
+    thread.start()
+    inserted = 0
+    pending = 0
+    times = None
+    started = time.monotonic()
+    try:
+        while True:
+            try:
+                item = blocks.get(timeout=max(0.0, started + batch_seconds - time.monotonic()) if pending else None)
+            except queue.Empty:
+                item = None
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                # Keep what has been read so far, the next run carries on from there
+                raise item
+            if item is not None:
+                block, header, first, count, starttime, interval, data = item
+                with timer(stats, 'decode'):
+                    rows = block_rows(serial, data, starttime, interval)
+                with timer(stats, 'storage'):
+                    inserted += insert_rows(db, rows)
+                    db.execute('INSERT OR REPLACE INTO sync (serial, block, header, count) VALUES (?,?,?,?)', (serial, block, header, count))
+                    times = span(rows, times)
+                if not pending:
+                    started = time.monotonic()
+                pending += len(rows)
+            if pending and (pending >= batch_rows or time.monotonic() - started >= batch_seconds):
+                with timer(stats, 'commit'):
+                    commit(db, serial, times)
+                pending = 0
+                times = None
+    finally:
+        stop.set()
+        thread.join()
+        with timer(stats, 'commit'):
+            commit(db, serial, times)
+    return inserted
+
+def seconds(t):
+    # Database time of a datetime (logger time)
+    return t if t is None or isinstance(t, int) else calendar.timegm(t.timetuple())
+
+def rollups(db, serial, period='hour', start=None, end=None):
+    # (bucket, count, humidity mean, min, max, temperature mean, min, max) for the hours or days
+    # with samples from start up to end (datetimes or database times). The hour or day that start
+    # or end is part way through only has the samples in the range, as for summary().
+    table, size = ROLLUPS[period]
+    start, end = seconds(start), seconds(end)
+    rows = db.execute('SELECT bucket, count, 1.0 * humidity_sum / count, humidity_min, humidity_max, '
+                      'temperature_sum / count, temperature_min, temperature_max FROM ' + table + ' '
+                      'WHERE serial=? AND bucket >= ? AND bucket < ? ORDER BY bucket',
+                      (serial, 0 if start is None else start - start % size, 2 ** 62 if end is None else end)).fetchall()
+    for i, row in enumerate(rows):
+        bucket = row[0]
+        if (start is not None and bucket < start) or (end is not None and bucket + size > end):
+            part = summary(db, serial, max(bucket, start or bucket), min(bucket + size, end or bucket + size))
+            rows[i] = (bucket,) + part if part[0] else None
+    return [row for row in rows if row is not None]
+
+def summary(db, serial, start, end):
+    # (count, humidity mean, min, max, temperature mean, min, max) of the samples from start up to
+    # end, from the whole days in it, then the whole hours, and only the samples of the part
+    # hours at either end
+    start, end = seconds(start), seconds(end)
+    parts = []
+    hour_start, hour_end = -(-start // 3600) * 3600, end // 3600 * 3600
+    day_start, day_end = -(-start // 86400) * 86400, end // 86400 * 86400
+    if hour_start >= hour_end:
+        parts.append(('data', start, end))
+    else:
+        parts += [('data', start, hour_start), ('data', hour_end, end)]
+        if day_start >= day_end:
+            parts.append(('rollup_hour', hour_start, hour_end))
+        else:
+            parts += [('rollup_hour', hour_start, day_start), ('rollup_hour', day_end, hour_end),
+                      ('rollup_day', day_start, day_end)]
+    total = [0, 0, None, None, 0.0, None, None]
+    for table, a, b in parts:
+        if a >= b:
+            continue
+        if table == 'data':
+            row = db.execute('SELECT count(*), sum(humidity), min(humidity), max(humidity), sum(temperature_C), '
+                             'min(temperature_C), max(temperature_C) FROM data WHERE serial=? AND time >= ? AND time < ?',
+                             (serial, a, b)).fetchone()
+        else:
+            row = db.execute('SELECT sum(count), sum(humidity_sum), min(humidity_min), max(humidity_max), sum(temperature_sum), '
+                             'min(temperature_min), max(temperature_max) FROM ' + table + ' WHERE serial=? AND bucket >= ? AND bucket < ?',
+                             (serial, a, b)).fetchone()
+        if not row[0]:
+            continue
+        total[0] += row[0]
+        total[1] += row[1]
+        total[4] += row[4]
+        for i, pick in ((2, min), (3, max), (5, min), (6, max)):
+            total[i] = row[i] if total[i] is None else pick(total[i], row[i])
+    count = total[0]
+    if not count:
+        return 0, None, None, None, None, None, None
+    return count, total[1] / count, total[2], total[3], total[4] / count, total[5], total[6]
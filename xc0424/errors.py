@@ -0,0 +1,5 @@
+# Kept apart from transport.py so code that only reads images doesn't need pyusb
+
+class TransportError(Exception):
+    # USB errors, timeouts and bad responses from the logger
+    pass
@@ -0,0 +1,85 @@
+import calendar
+import datetime
+import gzip
+import io
+import sys
+from xc0424.blocks import SAMPLE, decode_sample, fahrenheit
+from xc0424.profile import timer, timed
+
+CSV_HEADER = "YYYY-MM-DDTHH:MM:SS,HUM_%,TEMP_C,TEMP_F\n"
+# Same as the old print_humtemp output, temperatures are always 1 decimal place
+CSV_ROW = '%s,%d,%.1f,%.1f\n'
+
+def open_output(path=None):
+    # Text stream for path, compressed if it ends in .gz or .zst. None or - is stdout.
+    # Raises ImportError for .zst without zstandard.
+    if path is None or path == '-':
+        return sys.stdout
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', newline='')
+    if path.endswith('.zst'):
+        # zstandard is optional, only needed for .zst output
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstandard is needed for .zst output (pip install zstandard)") from e
+        return io.TextIOWrapper(zstandard.open(path, 'wb'), newline='')
+    return open(path, 'w', newline='', buffering=1 << 16)
+
+def csv_block(data, starttime, interval):
+    # All the rows for a block of raw samples as one string
+    time_change = datetime.timedelta(seconds=interval)
+    rows = []
+    for humid, temp in SAMPLE.iter_unpack(data):
+        humid, temp = decode_sample(humid, temp)
+        rows.append(CSV_ROW % (starttime.isoformat(), humid, temp, fahrenheit(temp)))
+        starttime += time_change
+    return ''.join(rows)
+
+def write_csv(out, blocks, stats=None):
+    # blocks is (block, starttime, interval, data) as from read_blocks, one write per block
+    out.write(CSV_HEADER)
+    for block, starttime, interval, data in timed(stats, 'read', blocks):
+        with timer(stats, 'decode'):
+            text = csv_block(data, starttime, interval)
+        with timer(stats, 'storage'):
+            out.write(text)
+
+def arrow_schema(pa):
+    return pa.schema([('time', pa.timestamp('s')), ('humidity', pa.int16()), ('temp_c', pa.float64()),
+                      ('serial', pa.string()), ('block', pa.int16())])
+
+def arrow_block(pa, schema, serial, block, data, starttime, interval):
+    # One record batch for a block of raw samples. time is the logger's clock (no time zone).
+    start = calendar.timegm(starttime.timetuple())
+    samples = [decode_sample(humid, temp) for humid, temp in SAMPLE.iter_unpack(data)]
+    return pa.record_batch([
+        pa.array([start + i * interval for i in range(len(samples))], pa.timestamp('s')),
+        pa.array([humid for humid, temp in samples], pa.int16()),
+        pa.array([temp for humid, temp in samples], pa.float64()),
+        pa.array([serial] * len(samples), pa.string()),
+        pa.array([block] * len(samples), pa.int16()),
+    ], schema=schema)
+
+def write_arrow(path, serial, blocks, format='parquet', stats=None):
+    # Parquet (one row group per logger block) or Arrow IPC file (one record batch per block).
+    # pyarrow is optional, only needed for these formats, raises ImportError without it.
+    try:
+        import pyarrow as pa
+        if format == 'parquet':
+            import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("pyarrow is needed for %s output (pip install pyarrow)" % format) from e
+    schema = arrow_schema(pa)
+    if format == 'parquet':
+        writer = pq.ParquetWriter(path, schema, compression='zstd')
+        write = lambda batch: writer.write_batch(batch, row_group_size=len(batch) or None)
+    else:
+        writer = pa.ipc.new_file(path, schema)
+        write = writer.write_batch
+    with writer:
+        for block, starttime, interval, data in timed(stats, 'read', blocks):
+            with timer(stats, 'decode'):
+                batch = arrow_block(pa, schema, serial, block, data, starttime, interval)
+            with timer(stats, 'storage'):
+                write(batch)
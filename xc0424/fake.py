@@ -0,0 +1,219 @@
+import collections
+import datetime
+import math
+import random
+import time
+import usb.core
+from xc0424.blocks import block_header, MAP_START, BLOCKS, HEADER_START, HEADER_SIZE, DATA_START, BLOCK_SIZE
+from xc0424.image import Image, MEMORY_SIZE, CONFIG_ADDR
+
+# In-process stand in for an XC-0424 so the scripts can be run and timed without the hardware.
+# It has the parts of a pyusb Device that find_device and Transport use, checks the
+# 02 len ... checksum framing and answers from a memory image:
+#
+#   01 00 addr len      memory read
+#   01 01 02            current reading
+#   00 11 yy mm dd ...  set the clock
+#   00 22 config ...    write the configuration
+#   00 04 times ...     write the segmented times
+#   00 08               clear the data
+#
+# Anything else is not answered, the following read times out like the real thing would.
+# error_rate is the chance of any response being lost (read times out) or having a bad checksum.
+
+SEGMENTS_ADDR = 0x0018
+MINMAX_ADDR = 0x0050
+ACK = b'\xaa'
+
+def bcd(n):
+    # The dates are stored as hex but are decimal (ie 2023/05/15 is stored as 0x23 0x05 0x15)
+    return (n // 10) * 0x10 + n % 10
+
+def make_memory(serial=b'\x12\x34\x56\x78', blocks=BLOCKS, last=0x3f, start=datetime.datetime(2023, 5, 17, 13, 45, 8), interval=8):
+    # Memory with blocks used blocks, all full except the last which has last + 1 samples.
+    # Config is cyclic, 24h, C, LCD auto off with no offsets.
+    memory = bytearray(b'\xff' * MEMORY_SIZE)
+    memory[:MAP_START] = bytes(MAP_START)
+    memory[CONFIG_ADDR:CONFIG_ADDR + 10] = bytes(serial) + bytes((0x2d, interval >> 8, interval & 0xff, 0x00, 100, 20))
+    # Maximum then minimum, temperature (2 bytes) and humidity
+    memory[MINMAX_ADDR:MINMAX_ADDR + 6] = bytes((0x02, 0xed, 80, 0x02, 0x8f, 60))
+    starttime = start
+    sample = 0
+    for block in range(blocks):
+        count = 0x40 if block < blocks - 1 else last + 1
+        memory[MAP_START + block] = count - 1
+        memory[HEADER_START + block * HEADER_SIZE:HEADER_START + (block + 1) * HEADER_SIZE] = header_bytes(starttime, interval)
+        addr = DATA_START + block * BLOCK_SIZE
+        for i in range(count):
+            memory[addr + i * 3:addr + i * 3 + 3] = sample_bytes(sample)
+            sample += 1
+        starttime += datetime.timedelta(seconds=interval * count)
+    return memory
+
+def header_bytes(starttime, interval):
+    return bytes((bcd(starttime.year - 2000), bcd(starttime.month), bcd(starttime.day),
+                  bcd(starttime.hour), bcd(starttime.minute), bcd(starttime.second), interval >> 8, interval & 0xff))
+
+def sample_bytes(sample):
+    # A slow daily cycle so consecutive samples are close like the real thing
+    humid = 50 + round(10 * math.sin(sample / 1000))
+    temp = round(220 + 50 * math.sin(sample / 700))
+    return bytes((humid + 20, (temp + 500) >> 8, (temp + 500) & 0xff))
+
+
+class Endpoint:
+    def __init__(self, address, size):
+        self.bEndpointAddress = address
+        self.wMaxPacketSize = size
+
+
+class FakeDevice:
+    def __init__(self, memory=None, latency=0.0, packet_size=64, error_rate=0.0, seed=0):
+        self.memory = bytearray(memory if memory is not None else make_memory())
+        # Seconds added to every command to act like a USB round trip
+        self.latency = latency
+        self.packet_size = packet_size
+        self.endpoints = [Endpoint(0x81, packet_size), Endpoint(0x02, packet_size)]
+        self.responses = collections.deque()
+        self.clock = None
+        self.current = (50, 22.0)
+        self.transactions = 0
+        self.error_rate = error_rate
+        self.errors = 0
+        self.random = random.Random(seed)
+        # Samples logged so far, for the values of the ones added by record()
+        self.logged = sum(count + 1 for count in self.memory[MAP_START:MAP_START + BLOCKS] if count != 0xff)
+
+    @classmethod
+    def from_image(cls, path, **kwargs):
+        return cls(Image.load(path).memory, **kwargs)
+
+    # The bits of a pyusb Device used by find_device and Transport
+    def __getitem__(self, config):
+        return {(0,0): self.endpoints}
+
+    def is_kernel_driver_active(self, interface):
+        return False
+
+    def detach_kernel_driver(self, interface):
+        pass
+
+    def reset(self):
+        self.responses.clear()
+
+    def set_configuration(self):
+        pass
+
+    def write(self, endpoint, data, timeout=None):
+        data = bytes(data)
+        if len(data) > self.packet_size:
+            raise usb.core.USBError('packet too long')
+        size = data[1]
+        command = data[2:size + 1]
+        if data[0] != 0x02 or size < 1 or (sum(command) & 0xff) != data[size + 1]:
+            # Bad framing, the logger just ignores it
+            self.responses.append(None)
+            return len(data)
+        self.transactions += 1
+        self.responses.append(self.command(command))
+        return len(data)
+
+    def read(self, endpoint, size_or_buffer, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+        response = self.responses.popleft() if self.responses else None
+        corrupt = False
+        if response is not None and self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            if self.random.random() < 0.5:
+                response = None
+            else:
+                corrupt = True
+        if response is None:
+            raise usb.core.USBTimeoutError('Operation timed out', errno=110)
+        pkt = bytearray(self.packet_size)
+        pkt[0] = 0x02
+        pkt[1] = len(response) + 1
+        pkt[2:2 + len(response)] = response
+        pkt[2 + len(response)] = (sum(response) + corrupt) & 0xff
+        if isinstance(size_or_buffer, int):
+            return pkt[:size_or_buffer]
+        size_or_buffer[:len(pkt)] = type(size_or_buffer)('B', pkt)
+        return len(pkt)
+
+    def command(self, command):
+        match bytes(command[:2]):
+            case b'\x01\x00':
+                addr = (command[2] << 8) | command[3]
+                return bytes(self.memory[addr:addr + command[4]])
+            case b'\x01\x01':
+                humid, temp = self.current
+                temp = round(temp * 10) + 500
+                return bytes((humid + 20, temp >> 8, temp & 0xff))
+            case b'\x00\x11':
+                d = command[2:8].hex()
+                self.clock = datetime.datetime.strptime(d, '%y%m%d%H%M%S')
+                return ACK
+            case b'\x00\x22':
+                self.memory[CONFIG_ADDR + 4:CONFIG_ADDR + 10] = command[2:8]
+                return ACK
+            case b'\x00\x04':
+                self.memory[SEGMENTS_ADDR:SEGMENTS_ADDR + len(command) - 2] = command[2:]
+                return ACK
+            case b'\x00\x08':
+                self.memory[MAP_START:MAP_START + BLOCKS] = b'\xff' * BLOCKS
+                return ACK
+        return None
+
+    def record(self, count):
+        # Log count more samples after the newest one like the logger would: the newest block is
+        # filled up then the next one is started. In cyclic mode the next block after the last one
+        # is block 0, overwriting the oldest data, otherwise logging stops when the memory is full.
+        # Returns the number of samples added.
+        map = self.memory[MAP_START:MAP_START + BLOCKS]
+        used = [block for block in range(BLOCKS) if map[block] != 0xff]
+        cyclic = self.memory[CONFIG_ADDR + 4] & 0x18 == 0x08
+        interval = ((self.memory[CONFIG_ADDR + 5] & 0x7f) << 8) + self.memory[CONFIG_ADDR + 6]
+        if used:
+            block = max(used, key=lambda block: self.header(block)[0])
+            starttime, interval = self.header(block)
+            starttime += datetime.timedelta(seconds=interval * (map[block] + 1))
+        else:
+            block = None
+            starttime = (self.clock or datetime.datetime(2023, 5, 17, 13, 45, 8)).replace(microsecond=0)
+        for n in range(count):
+            if block is None or self.memory[MAP_START + block] == 0x3f:
+                block = 0 if block is None else (block + 1) % BLOCKS
+                if self.memory[MAP_START + block] != 0xff and not cyclic:
+                    return n
+                self.memory[MAP_START + block] = 0xff
+                self.memory[HEADER_START + block * HEADER_SIZE:HEADER_START + (block + 1) * HEADER_SIZE] = header_bytes(starttime, interval)
+            index = (self.memory[MAP_START + block] + 1) & 0xff
+            addr = DATA_START + block * BLOCK_SIZE + index * 3
+            self.memory[addr:addr + 3] = sample_bytes(self.logged)
+            self.memory[MAP_START + block] = index
+            self.logged += 1
+            starttime += datetime.timedelta(seconds=interval)
+        return count
+
+    def header(self, block):
+        # (start time, interval) of a block
+        return block_header(self.memory[HEADER_START + block * HEADER_SIZE:HEADER_START + (block + 1) * HEADER_SIZE])
+
+
+def install(devices):
+    # Make usb.core.find return the fake devices so the scripts run unchanged
+    def find(find_all=False, **kwargs):
+        if find_all:
+            return iter(devices)
+        return devices[0] if devices else None
+    usb.core.find = find
+
+
+if __name__ == '__main__':
+    # python -m xc0424.fake script.py [args...] runs one of the scripts against a fake logger
+    import runpy
+    import sys
+    install([FakeDevice()])
+    sys.argv = sys.argv[1:]
+    runpy.run_path(sys.argv[0], run_name='__main__')
@@ -0,0 +1,161 @@
+import mmap
+import os
+import struct
+import time
+from xc0424.errors import TransportError
+from xc0424.blocks import used_blocks, read_samples, MAP_START, BLOCKS, HEADER_START, HEADER_SIZE, DATA_START, BLOCK_SIZE
+
+# Snapshot image file:
+#   32 byte header: magic, version, serial (4 bytes), config (6 bytes), read time (unix seconds)
+#   followed by the logger memory from 0x0000 up to the end of the data area, at the same
+#   addresses as on the device. Memory that was not read (unused blocks) is left as ff.
+MAGIC = b'XC0424IM'
+VERSION = 1
+HEADER = struct.Struct('<8sB4s6sq5x')
+MEMORY_SIZE = DATA_START + BLOCKS * BLOCK_SIZE
+CONFIG_ADDR = 0x0005       # 01 00 00 05 0a config read, first 4 bytes are the serial?
+
+class Image:
+    def __init__(self, serial, config, read_time, memory):
+        self.serial = bytes(serial)
+        self.config = bytes(config)
+        self.read_time = read_time
+        self.memory = memory
+
+    @property
+    def serial_str(self):
+        return self.serial.hex().upper()
+
+    def read_memory(self, addr, length):
+        return self.memory[addr:addr + length]
+
+    def samples(self, **kwargs):
+        # skip, limit, start and end as for read_blocks
+        return read_samples(self, **kwargs)
+
+    def write(self, path):
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.serial, self.config, self.read_time))
+            f.write(self.memory)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            serial, config, read_time = parse_header(f.read(HEADER.size))
+            memory = f.read(MEMORY_SIZE)
+        if len(memory) != MEMORY_SIZE:
+            raise ValueError("%s: truncated image" % path)
+        return cls(serial, config, read_time, memory)
+
+class MappedImage(Image):
+    # Image file mapped with mmap instead of read in. read_memory returns memoryviews into the
+    # mapping so decoding never copies the file, and only the pages touched are read from disk.
+    # Any memoryviews still held when it is closed will make close() raise BufferError.
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            serial, config, read_time = parse_header(self.mm[:HEADER.size])
+            if len(self.mm) < HEADER.size + MEMORY_SIZE:
+                raise ValueError("%s: truncated image" % path)
+        except ValueError:
+            self.mm.close()
+            raise
+        super().__init__(serial, config, read_time, memoryview(self.mm)[HEADER.size:HEADER.size + MEMORY_SIZE])
+
+    def close(self):
+        self.memory.release()
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def parse_header(header):
+    if len(header) != HEADER.size:
+        raise ValueError("Not an XC-0424 image")
+    magic, version, serial, config, read_time = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("Not an XC-0424 image")
+    if version != VERSION:
+        raise ValueError("Unsupported image version %d" % version)
+    return serial, config, read_time
+
+def read_serial(source):
+    # Not sure what the first 4 bytes of the configuration are. They are always the same but vary
+    # between monitors. Assuming serial number.
+    return bytes(source.read_memory(CONFIG_ADDR, 4)).hex().upper()
+
+def snapshot(dev, checkpoint=None):
+    # Read the configuration, map, used block headers and used data blocks once.
+    # If checkpoint (a file name) is given and the read fails part way, the blocks read so far are
+    # saved there. The next snapshot with the same checkpoint only reads the blocks that are not in
+    # it or have changed since, then removes it. dev has to have been initialised.
+    response = dev.read_memory(CONFIG_ADDR, 10)
+    read_time = int(time.time())
+
+    memory = bytearray(b'\xff' * MEMORY_SIZE)
+    memory[CONFIG_ADDR:CONFIG_ADDR + len(response)] = response
+    map = dev.read_memory(MAP_START, BLOCKS)
+    used = used_blocks(map)
+    if used:
+        length = (used[-1] + 1) * HEADER_SIZE
+        memory[HEADER_START:HEADER_START + length] = dev.read_memory(HEADER_START, length)
+    previous = load_checkpoint(checkpoint, response[:4])
+    image = Image(response[:4], response[4:10], read_time, memory)
+    try:
+        for block in used:
+            addr = DATA_START + block * BLOCK_SIZE
+            length = (map[block] + 1) * 3
+            header = slice(HEADER_START + block * HEADER_SIZE, HEADER_START + (block + 1) * HEADER_SIZE)
+            if previous is not None and previous.memory[MAP_START + block] == map[block] and previous.memory[header] == memory[header]:
+                memory[addr:addr + length] = previous.memory[addr:addr + length]
+            else:
+                memory[addr:addr + length] = dev.read_memory(addr, length)
+            # The map is only filled in as blocks are read so a checkpoint shows which ones it has
+            memory[MAP_START + block] = map[block]
+    except (TransportError, KeyboardInterrupt):
+        if checkpoint:
+            save_checkpoint(image, checkpoint)
+        raise
+    if checkpoint and previous is not None:
+        os.remove(checkpoint)
+    return image
+
+def load_checkpoint(path, serial):
+    # A checkpoint is an image file, only used if it is from the same logger
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        previous = Image.load(path)
+    except ValueError:
+        return None
+    if previous.serial != bytes(serial):
+        return None
+    return previous
+
+def save_checkpoint(image, path):
+    tmp = path + '.tmp'
+    image.write(tmp)
+    os.replace(tmp, path)
+
+def open_source(path=None, stats=None, cache=None):
+    # Either a snapshot image or the device, both have read_memory. cache is a directory for
+    # the device's cache (xc0424/cache.py), call save() on the source when done.
+    # Raises ValueError if the image can't be opened or read.
+    if path:
+        try:
+            return MappedImage(path)
+        except OSError as e:
+            raise ValueError(str(e)) from e
+    # pyusb is only needed when reading the device
+    from xc0424.transport import find_device, Transport
+    dev = Transport(find_device(), stats=stats)
+    if cache:
+        from xc0424.cache import CachedTransport
+        dev = CachedTransport(dev, cache)
+    # Possibly initialise
+    dev.initialise()
+    return dev
@@ -0,0 +1,64 @@
+import bisect
+import datetime
+import heapq
+import itertools
+from xc0424.blocks import block_header, used_blocks, sample_range, MAP_START, BLOCKS, HEADER_START, HEADER_SIZE, DATA_START, BLOCK_SIZE
+
+# Every block's time span is known from its header (start time and interval) and the map
+# (number of samples), so a time range can be answered by reading only the data blocks in it.
+
+class BlockIndex:
+    def __init__(self, source):
+        # Reads the map and the used block headers once
+        map = source.read_memory(MAP_START, BLOCKS)
+        used = used_blocks(map)
+        self.map = map
+        self.headers = b''
+        entries = []
+        if used:
+            self.headers = source.read_memory(HEADER_START, (used[-1] + 1) * HEADER_SIZE)
+            for block in used:
+                starttime, interval = block_header(self.headers[block * HEADER_SIZE:(block + 1) * HEADER_SIZE])
+                count = map[block] + 1
+                entries.append((starttime, starttime + datetime.timedelta(seconds=interval * count), block, interval, count))
+        # Oldest first (cyclic mode wraps around so memory order isn't time order)
+        self.entries = time_order(entries)
+        self.starts = [entry[0] for entry in self.entries]
+        # The latest end time so far. Blocks can overlap in time if the clock has been set back,
+        # so the end times themselves aren't always in order.
+        self.ends = list(itertools.accumulate((entry[1] for entry in self.entries), max))
+
+    def overlapping(self, start=None, end=None):
+        # (starttime, endtime, block, interval, count) of the blocks with samples from start up to end
+        lo = 0 if start is None else bisect.bisect_right(self.ends, start)
+        hi = len(self.entries) if end is None else bisect.bisect_left(self.starts, end)
+        return [entry for entry in self.entries[lo:hi] if start is None or entry[1] > start]
+
+    def read_blocks(self, source, start=None, end=None):
+        # Same as blocks.read_blocks(source, start=start, end=end) but oldest first and without
+        # reading the map and headers again
+        for starttime, endtime, block, interval, count in self.overlapping(start, end):
+            first, count = sample_range(starttime, interval, count, start, end)
+            if first >= count:
+                continue
+            data = source.read_memory(DATA_START + block * BLOCK_SIZE + first * 3, (count - first) * 3)
+            yield block, starttime + datetime.timedelta(seconds=interval * first), interval, data
+
+
+def time_order(entries):
+    # entries (starting with the start time) in memory order are a few runs that are already in
+    # time order, one in acyclic mode and two once cyclic mode has wrapped around (more if the
+    # clock has been set back), so merge the runs rather than sorting the lot
+    runs = []
+    for entry in entries:
+        if not runs or entry[0] < runs[-1][-1][0]:
+            runs.append([])
+        runs[-1].append(entry)
+    if len(runs) < 2:
+        return entries
+    return list(heapq.merge(*runs))
+
+def read_blocks_in_order(source, start=None, end=None):
+    # read_blocks oldest first, one block read at a time
+    index = BlockIndex(source)
+    return index.read_blocks(source, start, end)
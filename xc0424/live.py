@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+import urllib.parse
+from array import array
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from xc0424.transport import CMD_CURRENT
+from xc0424.blocks import decode_sample, fahrenheit, SAMPLE
+from xc0424.errors import TransportError
+
+# Polls the current reading (01 01 02) and keeps the last size readings in a ring buffer.
+# The columns are arrays (time as float seconds, humidity %, temperature in tenths of a C as the
+# logger sends it) written in place, so a day of readings every second is a few hundred KB.
+
+class Ring:
+    def __init__(self, size):
+        self.size = size
+        self.time = array('d', bytes(8 * size))
+        self.humidity = array('b', bytes(size))
+        self.temp = array('h', bytes(2 * size))
+        # Total readings added, the next goes in at count % size
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def append(self, t, humidity, temp):
+        with self.lock:
+            i = self.count % self.size
+            self.time[i] = t
+            self.humidity[i] = humidity
+            self.temp[i] = temp
+            self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def latest(self):
+        # (time, humidity, temperature C) or None before the first reading
+        with self.lock:
+            if not self.count:
+                return None
+            i = (self.count - 1) % self.size
+            return self.time[i], self.humidity[i], self.temp[i] / 10
+
+    def history(self, n=None, since=None):
+        # The last n readings (all of them if None) newer than since, oldest first
+        with self.lock:
+            n = len(self) if n is None else min(n, len(self))
+            readings = []
+            for j in range(self.count - n, self.count):
+                i = j % self.size
+                if since is None or self.time[i] > since:
+                    readings.append((self.time[i], self.humidity[i], self.temp[i] / 10))
+            return readings
+
+
+class Poller(threading.Thread):
+    def __init__(self, dev, ring, interval=5.0):
+        super().__init__(daemon=True)
+        self.dev = dev
+        self.ring = ring
+        self.interval = interval
+        self.errors = 0
+        self.last_error = None
+        self.stopping = threading.Event()
+
+    def poll(self):
+        humidity, temp_c = decode_sample(*SAMPLE.unpack_from(self.dev.send_command(CMD_CURRENT)))
+        self.ring.append(time.time(), humidity, round(temp_c * 10))
+
+    def run(self):
+        # On a fixed schedule so a slow read doesn't push the following ones back
+        next_poll = time.monotonic()
+        while not self.stopping.is_set():
+            try:
+                self.poll()
+            except TransportError as e:
+                # Transport has already retried, try again next time
+                self.errors += 1
+                self.last_error = str(e)
+            next_poll += self.interval
+            delay = next_poll - time.monotonic()
+            if delay < 0:
+                next_poll = time.monotonic()
+                delay = 0
+            self.stopping.wait(delay)
+
+    def stop(self):
+        self.stopping.set()
+
+
+def reading(r):
+    t, humidity, temp_c = r
+    return {'time': t, 'humidity': humidity, 'temp_c': temp_c, 'temp_f': round(fahrenheit(temp_c), 1)}
+
+def make_handler(poller, serial=None):
+    ring = poller.ring
+
+    class Handler(BaseHTTPRequestHandler):
+        # GET /latest                   the last reading
+        # GET /history?n=60&since=T     recent readings, oldest first
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            query = urllib.parse.parse_qs(url.query)
+            try:
+                if url.path in ('/', '/latest'):
+                    latest = ring.latest()
+                    body = {'serial': serial, 'interval': poller.interval, 'errors': poller.errors,
+                            'last_error': poller.last_error, 'latest': latest and reading(latest)}
+                elif url.path == '/history':
+                    n = int(query['n'][0]) if 'n' in query else None
+                    since = float(query['since'][0]) if 'since' in query else None
+                    body = {'serial': serial, 'readings': [reading(r) for r in ring.history(n, since)]}
+                else:
+                    self.send_error(404)
+                    return
+            except ValueError:
+                self.send_error(400)
+                return
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def serve(poller, address, serial=None):
+    server = ThreadingHTTPServer(address, make_handler(poller, serial))
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,120 @@
+import bisect
+import contextlib
+import json
+import sys
+import threading
+import time
+
+# Timings for a run: every USB command by opcode (latency histogram, bytes each way) plus the
+# time spent in each stage (reading blocks, decoding, storing). Pass a Stats as stats= to
+# Transport, sync(), write_csv(), write_arrow() and ArchiveWriter.write_blocks() and write it out at the end with write_stats().
+
+# Command latency histogram bucket upper bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 5.0)
+
+OPCODES = {
+    b'\x01\x00': 'read',
+    b'\x01\x01': 'current',
+    b'\x00\x11': 'clock',
+    b'\x00\x22': 'config',
+    b'\x00\x04': 'segments',
+    b'\x00\x08': 'clear',
+}
+
+class Stats:
+    def __init__(self):
+        # Collector threads can share one
+        self.lock = threading.Lock()
+        self.commands = {}
+        self.stages = {}
+
+    def command(self, opcode, seconds, bytes_out, bytes_in):
+        name = OPCODES.get(bytes(opcode), bytes(opcode).hex())
+        with self.lock:
+            c = self.commands.get(name)
+            if c is None:
+                c = self.commands[name] = {'count': 0, 'seconds': 0.0, 'bytes_out': 0, 'bytes_in': 0,
+                                           'buckets': [0] * (len(BUCKETS) + 1)}
+            c['count'] += 1
+            c['seconds'] += seconds
+            c['bytes_out'] += bytes_out
+            c['bytes_in'] += bytes_in
+            c['buckets'][bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def stage(self, name, seconds):
+        with self.lock:
+            s = self.stages.setdefault(name, {'count': 0, 'seconds': 0.0})
+            s['count'] += 1
+            s['seconds'] += seconds
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage(name, time.perf_counter() - start)
+
+    def timed(self, name, iterable):
+        # Time spent getting each item from iterable (ie reading the next block)
+        it = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.stage(name, time.perf_counter() - start)
+                return
+            self.stage(name, time.perf_counter() - start)
+            yield item
+
+    def to_dict(self):
+        with self.lock:
+            commands = {}
+            for name, c in self.commands.items():
+                commands[name] = dict(c, buckets=dict(zip([str(b) for b in BUCKETS] + ['+Inf'], c['buckets'])))
+            return {'commands': commands, 'stages': {name: dict(s) for name, s in self.stages.items()}}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self):
+        stats = self.to_dict()
+        lines = ['# TYPE xc0424_command_seconds histogram']
+        for name, c in stats['commands'].items():
+            total = 0
+            for le, n in c['buckets'].items():
+                total += n
+                lines.append('xc0424_command_seconds_bucket{opcode="%s",le="%s"} %d' % (name, le, total))
+            lines.append('xc0424_command_seconds_sum{opcode="%s"} %f' % (name, c['seconds']))
+            lines.append('xc0424_command_seconds_count{opcode="%s"} %d' % (name, c['count']))
+        lines.append('# TYPE xc0424_command_bytes_total counter')
+        for name, c in stats['commands'].items():
+            lines.append('xc0424_command_bytes_total{opcode="%s",direction="out"} %d' % (name, c['bytes_out']))
+            lines.append('xc0424_command_bytes_total{opcode="%s",direction="in"} %d' % (name, c['bytes_in']))
+        lines.append('# TYPE xc0424_stage_seconds_total counter')
+        for name, s in stats['stages'].items():
+            lines.append('xc0424_stage_seconds_total{stage="%s"} %f' % (name, s['seconds']))
+        lines.append('# TYPE xc0424_stage_calls_total counter')
+        for name, s in stats['stages'].items():
+            lines.append('xc0424_stage_calls_total{stage="%s"} %d' % (name, s['count']))
+        return '\n'.join(lines) + '\n'
+
+def timer(stats, name):
+    # stats.timer(name) or nothing when stats is None
+    if stats is None:
+        return contextlib.nullcontext()
+    return stats.timer(name)
+
+def timed(stats, name, iterable):
+    if stats is None:
+        return iterable
+    return stats.timed(name, iterable)
+
+def write_stats(stats, path):
+    # Prometheus text format if path ends in .prom, otherwise JSON. - is stderr.
+    if path == '-':
+        print(stats.to_json(), file=sys.stderr)
+        return
+    with open(path, 'w') as f:
+        f.write(stats.to_prometheus() if path.endswith('.prom') else stats.to_json())
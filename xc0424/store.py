@@ -0,0 +1,120 @@
+import bisect
+import calendar
+import datetime
+from array import array
+from xc0424.blocks import read_blocks, decode_sample, fahrenheit, SAMPLE
+
+# Decoded samples held in memory without an object per sample. The samples are kept as the
+# logger stores them (humidity + 20 and temperature * 10 + 500) in two array columns, 3 bytes a
+# sample, plus the start time, interval and first sample of each block. Times, C and F are
+# worked out when asked for.
+#
+#   store = SampleStore.from_source(image)
+#   for sample in store:
+#       print(sample.time, sample.humidity, sample.temp_f)
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+class Sample:
+    # A view of one sample in a SampleStore
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def time(self):
+        return EPOCH + datetime.timedelta(seconds=self.store.timestamp(self.index))
+
+    @property
+    def humidity(self):
+        return self.decoded()[0]
+
+    @property
+    def temp_c(self):
+        return self.decoded()[1]
+
+    @property
+    def temp_f(self):
+        return fahrenheit(self.temp_c)
+
+    def decoded(self):
+        return decode_sample(self.store.humid[self.index], self.store.temp[self.index])
+
+    def __iter__(self):
+        # So it unpacks like the block_samples tuples
+        return iter((self.time, self.humidity, self.temp_c))
+
+    def __repr__(self):
+        return 'Sample(%s, %d, %.1f)' % (self.time.isoformat(), self.humidity, self.temp_c)
+
+
+class SampleStore:
+    __slots__ = ('humid', 'temp', 'starts', 'intervals', 'offsets')
+
+    def __init__(self):
+        self.humid = array('B')
+        self.temp = array('H')
+        # Per block: start time (seconds since 1970 of the logger's clock), interval and the
+        # index of its first sample
+        self.starts = array('q')
+        self.intervals = array('H')
+        self.offsets = array('L')
+
+    @classmethod
+    def from_source(cls, source, **kwargs):
+        # Every sample of a Transport or Image, kwargs (skip, limit, start, end) as for read_blocks
+        store = cls()
+        store.extend(read_blocks(source, **kwargs))
+        return store
+
+    def add(self, starttime, interval, data):
+        # A block of raw 3 byte samples
+        self.starts.append(calendar.timegm(starttime.timetuple()))
+        self.intervals.append(interval)
+        self.offsets.append(len(self.humid))
+        data = bytes(data)
+        self.humid.extend(data[0::3])
+        self.temp.extend(temp for humid, temp in SAMPLE.iter_unpack(data))
+
+    def extend(self, blocks):
+        # (block, starttime, interval, data) from read_blocks or BlockIndex.read_blocks
+        for block, starttime, interval, data in blocks:
+            self.add(starttime, interval, data)
+
+    def __len__(self):
+        return len(self.humid)
+
+    def block_of(self, index):
+        return bisect.bisect_right(self.offsets, index) - 1
+
+    def timestamp(self, index):
+        b = self.block_of(index)
+        return self.starts[b] + (index - self.offsets[b]) * self.intervals[b]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('sample index out of range')
+        return Sample(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield Sample(self, index)
+
+    def samples(self):
+        # (time, humidity, temperature C) like read_samples, a block at a time rather than
+        # looking up the block of every sample
+        for b in range(len(self.starts)):
+            end = self.offsets[b + 1] if b + 1 < len(self.offsets) else len(self)
+            time = EPOCH + datetime.timedelta(seconds=self.starts[b])
+            step = datetime.timedelta(seconds=self.intervals[b])
+            for index in range(self.offsets[b], end):
+                yield (time,) + decode_sample(self.humid[index], self.temp[index])
+                time += step
+
+    @property
+    def nbytes(self):
+        return sum(len(a) * a.itemsize for a in (self.humid, self.temp, self.starts, self.intervals, self.offsets))
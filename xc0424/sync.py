@@ -0,0 +1,59 @@
+import datetime
+from xc0424.blocks import block_header, used_blocks, MAP_START, BLOCKS, HEADER_START, HEADER_SIZE, DATA_START, BLOCK_SIZE
+from xc0424.index import time_order
+
+# Incremental reads. The high water mark is (block, header, count) of the newest block already
+# read: its number, its 8 byte header and how many samples of it were read.
+
+def read_new_blocks(source, last=None):
+    # Yields (block, header, first, count, starttime, interval, data) oldest first, where data is
+    # samples first to count - 1 of the block and starttime is the time of sample first.
+    # (block, header, count) of the last one yielded is the new high water mark.
+    map = source.read_memory(MAP_START, BLOCKS)
+    if last is not None:
+        block, header, count = last
+        if map[block] != 0xff and bytes(source.read_memory(HEADER_START + block * HEADER_SIZE, HEADER_SIZE)) == bytes(header):
+            yield from read_after(source, map, block, bytes(header), count)
+            return
+    # Nothing read yet, or the logger has been cleared or reconfigured since, so read everything
+    yield from read_all(source, map)
+
+def read_all(source, map):
+    used = used_blocks(map)
+    if not used:
+        return
+    headers = source.read_memory(HEADER_START, (used[-1] + 1) * HEADER_SIZE)
+    blocks = []
+    for block in used:
+        header = bytes(headers[block * HEADER_SIZE:(block + 1) * HEADER_SIZE])
+        starttime, interval = block_header(header)
+        blocks.append((starttime, block, header, interval))
+    # Oldest first so the high water mark only ever moves forward (cyclic mode wraps around)
+    for starttime, block, header, interval in time_order(blocks):
+        count = map[block] + 1
+        data = source.read_memory(DATA_START + block * BLOCK_SIZE, count * 3)
+        yield block, header, 0, count, starttime, interval, data
+
+def read_after(source, map, block, header, count):
+    # The rest of the last block read, if it has grown
+    starttime, interval = block_header(header)
+    total = map[block] + 1
+    if total > count:
+        data = source.read_memory(DATA_START + block * BLOCK_SIZE + count * 3, (total - count) * 3)
+        yield block, header, count, total, starttime + datetime.timedelta(seconds=interval * count), interval, data
+
+    # Then the following blocks (wrapping in cyclic mode) for as long as they are newer
+    last_start = starttime
+    for i in range(1, BLOCKS):
+        block = (block + 1) % BLOCKS
+        if map[block] == 0xff:
+            break
+        header = bytes(source.read_memory(HEADER_START + block * HEADER_SIZE, HEADER_SIZE))
+        starttime, interval = block_header(header)
+        if starttime <= last_start:
+            # Older data not yet overwritten in cyclic mode
+            break
+        total = map[block] + 1
+        data = source.read_memory(DATA_START + block * BLOCK_SIZE, total * 3)
+        yield block, header, 0, total, starttime, interval, data
+        last_start = starttime
@@ -0,0 +1,252 @@
+import array
+import collections
+import time
+import usb.core
+import usb.util
+from xc0424.errors import TransportError
+
+VID = 0x10C4
+PID = 0x8468
+
+# Commands (without the 0x02 length header and checksum)
+CMD_INIT = b'\x01\x00\x00\x02\x02'          # Not sure what this read does, possibly initialise
+CMD_CONFIG = b'\x01\x00\x00\x05\x0a'        # Serial? (4 bytes) + configuration (6 bytes)
+CMD_SEGMENTS = b'\x01\x00\x00\x18\x28'      # Segmented mode start/end times
+CMD_MINMAX = b'\x01\x00\x00\x50\x06'        # Maximum and minimum readings
+CMD_CURRENT = b'\x01\x01\x02'               # Current reading
+CMD_CLEAR = b'\x00\x08'                     # Clear data
+
+# Largest 01 00 memory read that fits in a response packet
+READ_MAX = 0x27
+
+# The init probe is a read of 0002, reading on to the end of the configuration (0005 to 000e)
+# gets both in the same transaction
+STATUS_ADDR = CMD_INIT[3]
+CONFIG_ADDR = CMD_CONFIG[3]
+STATUS_SIZE = CONFIG_ADDR + CMD_CONFIG[4] - STATUS_ADDR
+
+# Defaults for Transport: USB timeout (ms), retries of a failed command and the first
+# backoff (seconds, doubled on each retry)
+TIMEOUT = 1000
+RETRIES = 3
+BACKOFF = 0.1
+# Timeout (ms) when throwing away stale responses after an error
+DRAIN_TIMEOUT = 50
+
+def find_device(VID=VID, PID=PID):
+    try:
+        device = usb.core.find(idVendor = VID, idProduct = PID)
+    except usb.core.NoBackendError as e:
+        raise TransportError("Could not find device: %s" % str(e)) from e
+
+    if device is None:
+        raise TransportError("Could not find device.")
+
+    return prepare_device(device)
+
+
+def find_devices(VID=VID, PID=PID):
+    # Every attached logger
+    try:
+        devices = list(usb.core.find(find_all = True, idVendor = VID, idProduct = PID))
+    except usb.core.NoBackendError as e:
+        raise TransportError("Could not find device: %s" % str(e)) from e
+
+    if not devices:
+        raise TransportError("Could not find device.")
+
+    return [prepare_device(device) for device in devices]
+
+
+def prepare_device(device):
+    try:
+        if device.is_kernel_driver_active(0):
+            device.detach_kernel_driver(0)
+    except usb.core.USBError as e:
+        raise TransportError("Could not detach kernel driver: %s" % str(e))
+    except NotImplementedError:
+        # This is not a thing on Windows so ignore the error
+        pass
+
+    try:
+        device.reset()
+        device.set_configuration()
+    except usb.core.USBError as e:
+        raise TransportError("Could not set configuration: %s" % str(e))
+    return device
+
+
+class Transport:
+    def __init__(self, device, timeout=TIMEOUT, depth=1, stats=None, retries=RETRIES, backoff=BACKOFF, checksum=True):
+        self.device = device
+        self.timeout = timeout
+        # Responses are framed like the commands (02 len data... checksum), checksum=False
+        # skips checking the last byte
+        self.checksum = checksum
+        self.retries = retries
+        self.backoff = backoff
+        # xc0424.profile.Stats to record each command in, or None
+        self.stats = stats
+        self.in_flight = collections.deque()
+        # Number of memory reads to write before reading the first response.
+        # The logger only seems to answer one command at a time so leave it at 1 unless
+        # the device is known to queue them.
+        self.depth = depth
+        # Serial and configuration (as 01 00 00 05 0a) read by initialise(), until anything is written
+        self.config = None
+
+        # The endpoints are looked up once rather than on every command
+        # first configuration, first interface, ep 0 is in and ep 1 is out
+        intf = device[0][(0,0)]
+        self.ep_in = intf[0].bEndpointAddress
+        self.ep_out = intf[1].bEndpointAddress
+        self.in_size = intf[0].wMaxPacketSize
+        self.out_size = intf[1].wMaxPacketSize
+
+        # Packets are framed into these buffers instead of building new ones for every command
+        self.pkt = bytearray(self.out_size)
+        self.pkt[0] = 0x02
+        self.pkt_used = 0
+        self.resp = array.array('B', bytes(self.in_size))
+
+    def write(self, command):
+        # 02 len command... checksum, padded with zeros to the packet size
+        size = len(command)
+        end = size + 3
+        pkt = self.pkt
+        pkt[1] = (size + 1) & 0xff
+        pkt[2:end-1] = command
+        pkt[end-1] = sum(command) & 0xFF
+        # Clear anything left over from a longer previous command
+        if self.pkt_used > end:
+            pkt[end:self.pkt_used] = bytes(self.pkt_used - end)
+        self.pkt_used = end
+        #print (bytes(pkt[:end]).hex(' '), ' =>  ', end='', flush=True)
+
+        if self.stats is not None:
+            self.in_flight.append((bytes(command[:2]), size, time.perf_counter()))
+        try:
+            self.device.write(self.ep_out, pkt, self.timeout)
+        except usb.core.USBError as e:
+            raise TransportError(str(e)) from e
+
+    def read(self):
+        try:
+            length = self.device.read(self.ep_in, self.resp, self.timeout)
+        except usb.core.USBError as e:
+            raise TransportError(str(e)) from e
+        resp = self.resp
+        # The buffer is reused so anything past what was read is left from an earlier response
+        if length < 2:
+            raise TransportError("Short response of %d bytes" % length)
+        datasize = resp[1]
+        #print(bytes(resp[:datasize+2]).hex(' '))
+        # len data... checksum
+        if datasize < 1 or datasize + 2 > length:
+            raise TransportError("Bad response length %d in %d bytes" % (datasize, length))
+        if self.checksum and sum(resp[2:datasize+1]) & 0xff != resp[datasize+1]:
+            raise TransportError("Bad response checksum")
+        if self.stats is not None:
+            opcode, size, start = self.in_flight.popleft()
+            self.stats.command(opcode, time.perf_counter() - start, size, datasize - 1)
+        return self.resp[2:datasize+1].tobytes()
+
+    def send_command(self, command):
+        # command is bytes or a sequence of ints
+        if len(command) == 5 and command[0] == 0x01 and command[1] == 0x00:
+            config = self.read_config((command[2] << 8) | command[3], command[4])
+            if config is not None:
+                return config
+        elif command[0] != 0x01:
+            # A write, the configuration may have changed
+            self.config = None
+        attempt = 0
+        while True:
+            try:
+                self.write(command)
+                return self.read()
+            except TransportError:
+                if attempt >= self.retries:
+                    raise
+                self.recover(attempt)
+                attempt += 1
+
+    def recover(self, attempt, pending=0):
+        # Wait a bit longer each time, then throw away anything still on its way so the
+        # next response matches the next command. pending is the number of commands sent after
+        # the one that failed: the responses have no address so every one of those has to be
+        # read (or timed out) even if one in between was lost, then anything else until it goes quiet.
+        delay = self.backoff * (2 ** attempt)
+        time.sleep(delay)
+        if self.stats is not None:
+            self.stats.stage('retry', delay)
+        self.in_flight.clear()
+        for i in range(pending):
+            try:
+                self.device.read(self.ep_in, self.resp, DRAIN_TIMEOUT)
+            except usb.core.USBError:
+                pass
+        for i in range(self.depth + 1):
+            try:
+                self.device.read(self.ep_in, self.resp, DRAIN_TIMEOUT)
+            except usb.core.USBError:
+                break
+
+    def read_command(self, addr, size):
+        # 01 00 addr(2 bytes) len
+        return self.send_command((0x01, 0x00, addr >> 8, addr & 0xff, size))
+
+    def read_memory(self, addr, length):
+        # Read any size of memory, split into READ_MAX sized reads
+        # A failed read is retried (with backoff) from that chunk on, up to retries times in a row.
+        # After a failure the rest is read one at a time, with several in flight a lost response
+        # would leave the later ones out of step with their reads.
+        config = self.read_config(addr, length)
+        if config is not None:
+            return config
+        data = bytearray(length)
+        chunks = [(off, min(READ_MAX, length - off)) for off in range(0, length, READ_MAX)]
+        done = 0
+        sent = 0
+        attempt = 0
+        depth = self.depth
+        while done < len(chunks):
+            try:
+                # Keep up to depth reads in flight
+                while sent < len(chunks) and sent < done + depth:
+                    cmd_off, cmd_size = chunks[sent]
+                    cmd_addr = addr + cmd_off
+                    self.write((0x01, 0x00, cmd_addr >> 8, cmd_addr & 0xff, cmd_size))
+                    sent += 1
+                response = self.read()
+                off, size = chunks[done]
+                if len(response) != size:
+                    raise TransportError("Short read at %04x: %d of %d bytes" % (addr + off, len(response), size))
+            except TransportError:
+                if attempt >= self.retries:
+                    raise
+                self.recover(attempt, sent - done - 1)
+                attempt += 1
+                sent = done
+                depth = 1
+                continue
+            data[off:off+size] = response
+            done += 1
+            attempt = 0
+        return bytes(data)
+
+    def read_config(self, addr, length):
+        # The part of the configuration read by initialise(), None if addr to addr + length isn't all in it
+        if self.config is not None and CONFIG_ADDR <= addr and addr + length <= CONFIG_ADDR + len(self.config):
+            return self.config[addr - CONFIG_ADDR:addr - CONFIG_ADDR + length]
+        return None
+
+    def initialise(self):
+        # Possibly initialise, returns the same 2 bytes as CMD_INIT. The configuration is read in
+        # the same transaction and kept for reads of it until something is written.
+        self.config = None
+        response = self.read_command(STATUS_ADDR, STATUS_SIZE)
+        if response[0] == 0x55:
+            response = self.read_command(STATUS_ADDR, STATUS_SIZE)
+        self.config = response[CONFIG_ADDR - STATUS_ADDR:]
+        return response[:2]
@@ -0,0 +1,25 @@
+from collections import namedtuple
+import numpy as np
+from xc0424.blocks import read_blocks, decode_sample, fahrenheit
+
+# Batch decoding of the 3 byte samples with numpy (optional, only needed by this module)
+
+# humidity + 20, temperature * 10 + 500 (big endian)
+SAMPLE_DTYPE = np.dtype([('humid', 'u1'), ('temp', '>u2')])
+
+Samples = namedtuple('Samples', ['time', 'humidity', 'temp_c', 'temp_f'])
+
+def decode_block(data, starttime, interval):
+    # Decode a whole block of raw sample bytes in one go
+    raw = np.frombuffer(data, dtype=SAMPLE_DTYPE, count=len(data) // 3)
+    humid, temp_c = decode_sample(raw['humid'].astype(np.int16), raw['temp'].astype(np.int32))
+    temp_f = fahrenheit(temp_c)
+    times = np.datetime64(starttime, 's') + np.arange(len(raw)) * np.timedelta64(interval, 's')
+    return Samples(times, humid, temp_c, temp_f)
+
+def decode_blocks(source):
+    # All the samples in source (a Transport or an Image) as one set of arrays
+    blocks = [decode_block(data, starttime, interval) for block, starttime, interval, data in read_blocks(source)]
+    if not blocks:
+        return Samples(np.empty(0, 'datetime64[s]'), np.empty(0, np.int16), np.empty(0), np.empty(0))
+    return Samples(*(np.concatenate(column) for column in zip(*blocks)))
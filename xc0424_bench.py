@@ -0,0 +1,70 @@
+#!/bin/env python
+import argparse
+import io
+import os
+import tempfile
+import time
+from xc0424.fake import FakeDevice, make_memory
+from xc0424.transport import Transport
+from xc0424.blocks import read_blocks
+from xc0424.image import snapshot, read_serial
+from xc0424.export import write_csv
+from xc0424.db import open_db, sync, sync_pipelined
+
+# Download and export timings against the fake logger (xc0424/fake.py), no hardware needed
+
+def run(name, fake, samples, func, repeat):
+    best = None
+    for i in range(repeat):
+        start_transactions = fake.transactions
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, fake.transactions - start_transactions)
+    elapsed, transactions = best
+    print(f'{name:<24}{elapsed:8.3f} s {transactions:7d} transactions {transactions / elapsed:10.0f} trans/s {samples / elapsed:10.0f} samples/s')
+
+def main():
+    parser = argparse.ArgumentParser(description='Time downloads and exports against a simulated XC-0424')
+    parser.add_argument('--blocks', type=int, default=324, help='used blocks in the simulated memory (default 324, full)')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to each USB transaction (default 0)')
+    parser.add_argument('--depth', type=int, default=1, help='memory reads kept in flight (Transport depth)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='chance of each response being lost or corrupted (default 0)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each, the best is reported')
+    args = parser.parse_args()
+
+    fake = FakeDevice(make_memory(blocks=args.blocks), latency=args.latency, error_rate=args.error_rate)
+    dev = Transport(fake, depth=args.depth, backoff=0.001)
+    dev.initialise()
+    serial = read_serial(dev)
+    image = snapshot(dev)
+    samples = sum(len(data) // 3 for block, starttime, interval, data in read_blocks(image))
+    print(f'{args.blocks} blocks {samples} samples, latency {args.latency} s, depth {args.depth}, error rate {args.error_rate}')
+
+    run('download (snapshot)', fake, samples, lambda: snapshot(dev), args.repeat)
+    run('csv from device', fake, samples, lambda: write_csv(io.StringIO(), read_blocks(dev)), args.repeat)
+    run('csv from image', fake, samples, lambda: write_csv(io.StringIO(), read_blocks(image)), args.repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def sql_full(sync=sync):
+            path = os.path.join(tmp, 'full.db')
+            for f in (path, path + '-wal', path + '-shm'):
+                if os.path.exists(f):
+                    os.remove(f)
+            db = open_db(path, serial)
+            sync(db, dev, serial)
+            db.close()
+        run('sql sync (empty db)', fake, samples, sql_full, args.repeat)
+        run('sql pipelined (empty db)', fake, samples, lambda: sql_full(sync_pipelined), args.repeat)
+
+        db = open_db(os.path.join(tmp, 'incremental.db'), serial)
+        sync(db, dev, serial)
+        run('sql sync (no new data)', fake, 0, lambda: sync(db, dev, serial), args.repeat)
+        db.close()
+
+    if args.error_rate:
+        print(fake.errors, 'errors retried')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/bin/env python
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from xc0424.transport import find_devices, Transport
+from xc0424.image import snapshot, read_serial
+from xc0424.db import open_db, sync
+from xc0424.errors import TransportError
+
+def collect(device, args):
+    # Download one logger into its own database (or image)
+    dev = Transport(device)
+    serial = '?'
+    try:
+        # Possibly initialise
+        dev.initialise()
+        serial = read_serial(dev)
+        if args.image:
+            # A failed snapshot is kept here and picked up by the next run
+            image = snapshot(dev, os.path.join(args.dir, 'xc0424_' + serial + '.part'))
+            path = os.path.join(args.dir, 'xc0424_' + serial + '_' + datetime.fromtimestamp(image.read_time).strftime('%Y%m%d%H%M%S') + '.img')
+            image.write(path)
+            return serial, path
+        db = open_db(os.path.join(args.dir, 'xc0424_' + serial + '.db'), serial)
+        try:
+            inserted = sync(db, dev, serial, args.full)
+        finally:
+            db.close()
+        return serial, 'inserted %d samples' % inserted
+    except (TransportError, ValueError) as e:
+        # Only lose this logger (ValueError is an old database that can't be converted)
+        return serial, 'failed: %s' % e
+
+def main():
+    parser = argparse.ArgumentParser(description='Download every attached XC-0424 at the same time, each into its own xc0424_<serial>.db')
+    parser.add_argument('--image', action='store_true', help='write a snapshot image for each logger instead')
+    parser.add_argument('--full', action='store_true', help='read every block instead of only the ones newer than the last run')
+    parser.add_argument('--dir', default='.', help='directory for the databases or images')
+    parser.add_argument('--jobs', type=int, default=8, help='loggers to download at once (default 8)')
+    args = parser.parse_args()
+
+    devices = find_devices()
+    print('Found', len(devices), 'loggers')
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        for serial, result in pool.map(lambda device: collect(device, args), devices):
+            print(serial, result)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except TransportError as e:
+        sys.exit(str(e))
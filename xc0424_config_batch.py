@@ -0,0 +1,47 @@
+#!/bin/env python
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from xc0424.transport import find_devices, Transport
+from xc0424.config import load_settings, settings_for, write_config
+from xc0424.image import read_serial
+from xc0424.errors import TransportError
+
+def configure(device, spec, dry_run):
+    dev = Transport(device, timeout=5000)
+    serial = '?'
+    try:
+        # Possibly initialise
+        dev.initialise()
+        serial = read_serial(dev)
+        serial, changes = write_config(dev, settings_for(spec, serial), dry_run)
+        if not changes:
+            return serial, 'unchanged', ''
+        changed = ', '.join('%s %s -> %s' % (name, old, new) for name, (old, new) in changes.items())
+        return serial, 'would change' if dry_run else 'changed', changed
+    except (TransportError, ValueError) as e:
+        # Only lose this logger
+        return serial, 'failed', str(e)
+
+def main():
+    parser = argparse.ArgumentParser(description='Configure every attached XC-0424 from a settings file (TOML or JSON)')
+    parser.add_argument('settings', help='settings file, see xc0424/config.py for the format')
+    parser.add_argument('--dry-run', action='store_true', help='only show what would change')
+    parser.add_argument('--jobs', type=int, default=8, help='loggers to configure at once (default 8)')
+    args = parser.parse_args()
+
+    spec = load_settings(args.settings)
+    devices = find_devices()
+    print('Found', len(devices), 'loggers')
+    counts = {}
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        for serial, status, detail in pool.map(lambda device: configure(device, spec, args.dry_run), devices):
+            print(serial, status, detail)
+            counts[status] = counts.get(status, 0) + 1
+    print(', '.join('%d %s' % (n, status) for status, n in counts.items()))
+
+if __name__ == '__main__':
+    try:
+        main()
+    except TransportError as e:
+        sys.exit(str(e))
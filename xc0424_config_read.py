@@ -1,61 +1,9 @@
 #!/bin/env python
-import array
-import sys
-import usb.core
-import usb.util
 import datetime
+import sys
+from xc0424.transport import find_device, Transport, CMD_CONFIG, CMD_SEGMENTS, CMD_CURRENT, CMD_MINMAX
+from xc0424.errors import TransportError
 
-def find_device(VID, PID):
-    device = usb.core.find(idVendor = VID, idProduct = PID)
-
-    if device is None:
-        sys.exit("Could not find device.")
-
-    try:
-        if device.is_kernel_driver_active(0):
-            device.detach_kernel_driver(0)
-    except usb.core.USBError as e:
-        sys.exit("Could not detach kernel driver: %s" % str(e))
-    except NotImplementedError:
-        # This is not a thing on Windows so ignore the error
-        pass
-
-    try:
-        device.reset()
-        device.set_configuration()
-    except usb.core.USBError as e:
-        sys.exit("Could not set configuration: %s" % str(e))
-    return device
-
-
-def send_command(device, command):
-    # access the first configuration
-    # cfg = device[0]
-    # access the first interface
-    # intf = cfg[(0,0)]
-    # second endpoint
-    # ep = intf[1]
-    ep_in = device[0][(0,0)][0]
-    ep_out = device[0][(0,0)][1]
-
-    pkt = bytearray.fromhex(command)
-    pkt.append(sum(pkt) & 0xFF)
-    pkt = bytearray([ 0x02, len(pkt) & 0xff ]) + pkt
-    #print (bytes(pkt).hex(' '), ' =>  ', end='', flush=True)
-    pkt = pkt + array.array('B',(0,)*(ep_out.wMaxPacketSize-len(pkt)))
-
-    try:
-        device.write(ep_out.bEndpointAddress, pkt)
-    except usb.core.USBError as e:
-        sys.exit(str(e))
-
-    try:
-        data = bytes(device.read(ep_in.bEndpointAddress, ep_in.wMaxPacketSize))
-        datasize = data[1]
-        #print(data[:datasize+2].hex(' '))
-        return data[2:datasize+1]
-    except usb.core.USBError as e:
-        sys.exit(str(e))
 
 def date_hex(datedec):
     # The dates are stored as hex but are decimal (ie 2023/05/15 is stored as 0x23 0x05 0x15)
@@ -63,15 +11,13 @@ def date_hex(datedec):
     return datehex
 
 def main():
-    dev = find_device(0x10C4, 0x8468)
+    dev = Transport(find_device())
 
     # Possibly initialise
-    response = send_command(dev, '01 00 00 02 02')
-    if response[0] == 0x55:
-        response = send_command(dev, '01 00 00 02 02')
+    response = dev.initialise()
 
-    # Read configuration
-    response = send_command(dev, '01 00 00 05 0a')
+    # Read configuration (read with the init probe so this doesn't go to the logger again)
+    response = dev.send_command(CMD_CONFIG)
     #print(response.hex(' '))
 
     # Not sure what the first 4 bytes of the returned configuration are. They are always the same but vary between monitors. Assuming serial number.
@@ -134,7 +80,7 @@ def main():
 
     if mode == 0x10:
         # Read segmented data times
-        response = send_command(dev, '01 00 00 18 28')
+        response = dev.send_command(CMD_SEGMENTS)
 
         print('Segmented Times:')
         print('First Time:  ', end='')
@@ -196,14 +142,14 @@ def main():
         print()
 
     # Get current temp & hum
-    response = send_command(dev, '01 01 02')
+    response = dev.send_command(CMD_CURRENT)
     curtemp = (((response[1] * 0x100) + response[2]) - 500) / 10
     curtempF = curtemp * 9 / 5 + 32
     curhum = response[0] - 20
     print('Current: ', curtemp, 'C  ', f'{curtempF:0.1f}', 'F  ', curhum, '%', sep='')
 
     # Get max and mins
-    response = send_command(dev, '01 00 00 50 06')
+    response = dev.send_command(CMD_MINMAX)
     maxtemp = (((response[0] * 0x100) + response[1]) - 500) / 10
     maxtempF = maxtemp * 9 / 5 + 32
     maxhum = response[2] - 20
@@ -216,5 +162,8 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    try:
+        main()
+    except TransportError as e:
+        sys.exit(str(e))
 
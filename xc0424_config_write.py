@@ -1,73 +1,18 @@
 #!/bin/env python
-import array
 import sys
-import usb.core
-import usb.util
 from datetime import datetime
-
-def find_device(VID, PID):
-    device = usb.core.find(idVendor = VID, idProduct = PID)
-
-    if device is None:
-        sys.exit("Could not find device.")
-
-    try:
-        if device.is_kernel_driver_active(0):
-            device.detach_kernel_driver(0)
-    except usb.core.USBError as e:
-        sys.exit("Could not detach kernel driver: %s" % str(e))
-    except NotImplementedError:
-        # This is not a thing on Windows so ignore the error
-        pass
-
-    try:
-        device.reset()
-        device.set_configuration()
-    except usb.core.USBError as e:
-        sys.exit("Could not set configuration: %s" % str(e))
-    return device
-
-
-def send_command(device, command):
-    # access the first configuration
-    # cfg = device[0]
-    # access the first interface
-    # intf = cfg[(0,0)]
-    # second endpoint
-    # ep = intf[1]
-    ep_in = device[0][(0,0)][0]
-    ep_out = device[0][(0,0)][1]
-
-    pkt = bytearray.fromhex(command)
-    pkt.append(sum(pkt) & 0xFF)
-    pkt = bytearray([ 0x02, len(pkt) & 0xff ]) + pkt
-    #print (bytes(pkt).hex(' '), ' =>  ', end='', flush=True)
-    pkt = pkt + array.array('B',(0,)*(ep_out.wMaxPacketSize-len(pkt)))
-
-    try:
-        device.write(ep_out.bEndpointAddress, pkt, timeout=5000)
-    except usb.core.USBError as e:
-        sys.exit(str(e))
-
-    try:
-        data = bytes(device.read(ep_in.bEndpointAddress, ep_in.wMaxPacketSize, timeout=5000))
-        datasize = data[1]
-        #print(data[:datasize+2].hex(' '))
-        return data[2:datasize+1]
-    except usb.core.USBError as e:
-        sys.exit(str(e))
+from xc0424.transport import find_device, Transport, CMD_CONFIG, CMD_CLEAR
+from xc0424.errors import TransportError
 
 
 def main():
-    dev = find_device(0x10C4, 0x8468)
+    dev = Transport(find_device(), timeout=5000)
 
     # Not sure what this read does, possibly initialise
-    response = send_command(dev, '01 00 00 02 02')
-    if response[0] == 0x55:
-        response = send_command(dev, '01 00 00 02 02')
+    response = dev.initialise()
 
     # Read configuration
-    response = send_command(dev, '01 00 00 05 0a')
+    response = dev.send_command(CMD_CONFIG)
     config = response[4]
     # The most significate bit of the interval can be set so remove it before multipling
     interval = (((response[5]&0x7f)*0x100) + response[6])
@@ -206,25 +151,26 @@ def main():
         print("Invalid offset of", humoff, "supplied so default to 0")
         humoff = 20
 
-    cfg_str = "00 22 " + '%02x' % config + ' %02x' % int((interval & 0xff00)/0x100) + ' %02x' % int(interval & 0x00ff)
-    cfg_str = cfg_str + ' %02x' % int((tempoff & 0xff00)/0x100) + ' %02x' % int(tempoff & 0x00ff)
-    cfg_str = cfg_str + ' %02x' % humoff
-    #print(cfg_str)
+    cfg = bytes((0x00, 0x22, config, (interval >> 8) & 0xff, interval & 0xff, (tempoff >> 8) & 0xff, tempoff & 0xff, humoff))
+    #print(cfg.hex(' '))
 
-    # Write current date and time
-    response = send_command(dev, datetime.now().strftime("00 11 %y %m %d %H %M %S"))
+    # Write current date and time (stored as hex but are decimal, ie 23 05 15)
+    response = dev.send_command(b'\x00\x11' + bytes.fromhex(datetime.now().strftime("%y %m %d %H %M %S")))
 
     # Write configuration
-    response = send_command(dev, cfg_str)
+    response = dev.send_command(cfg)
     #print(response.hex(' '))
 
     if response[0]==0xaa and config & segmented == segmented:     # If segmented mode
         seg_times = first_times + " " + second_times + " " + third_times + " " + fourth_times
         # Write segmented times
-        response = send_command(dev, '00 04 '+seg_times)
+        response = dev.send_command(b'\x00\x04' + bytes.fromhex(seg_times))
         # Clear data
-        response = send_command(dev, '00 08')
+        response = dev.send_command(CMD_CLEAR)
 
 if __name__ == '__main__':
-    main()
+    try:
+        main()
+    except TransportError as e:
+        sys.exit(str(e))
 
@@ -1,137 +1,83 @@
 #!/bin/env python
-import array
-import sys
-import usb.core
-import usb.util
+import argparse
 import datetime
+import sys
+from xc0424.index import read_blocks_in_order
+from xc0424.image import open_source, read_serial
+from xc0424.export import open_output, write_csv, write_arrow
+from xc0424.archive import ArchiveWriter, open_archive
+from xc0424.blockstore import BlockStore
+from xc0424.profile import Stats, write_stats
+from xc0424.errors import TransportError
 
-def find_device(VID, PID):
-    device = usb.core.find(idVendor = VID, idProduct = PID)
-
-    if device is None:
-        sys.exit("Could not find device.")
-
-    try:
-        if device.is_kernel_driver_active(0):
-            device.detach_kernel_driver(0)
-    except usb.core.USBError as e:
-        sys.exit("Could not detach kernel driver: %s" % str(e))
-    except NotImplementedError:
-        # This is not a thing on Windows so ignore the error
-        pass
-
-    try:
-        device.reset()
-        device.set_configuration()
-    except usb.core.USBError as e:
-        sys.exit("Could not set configuration: %s" % str(e))
-    return device
-
-
-def send_command(device, command):
-    # access the first configuration
-    # cfg = device[0]
-    # access the first interface
-    # intf = cfg[(0,0)]
-    # second endpoint
-    # ep = intf[1]
-    ep_in = device[0][(0,0)][0]
-    ep_out = device[0][(0,0)][1]
-
-    pkt = bytearray.fromhex(command)
-    pkt.append(sum(pkt) & 0xFF)
-    pkt = bytearray([ 0x02, len(pkt) & 0xff ]) + pkt
-    #print (bytes(pkt).hex(' '), ' =>  ', end='', flush=True)
-    pkt = pkt + array.array('B',(0,)*(ep_out.wMaxPacketSize-len(pkt)))
 
+def main():
+    parser = argparse.ArgumentParser(description='Read the XC-0424 data to CSV (or Parquet / Arrow)')
+    parser.add_argument('--cache', metavar='DIR', help='keep the block headers in DIR and only read the ones of blocks that have changed (not in cyclic mode, where any block can be overwritten)')
+    parser.add_argument('--image', help='read from a snapshot image (xc0424_snapshot.py) instead of the device')
+    parser.add_argument('--archive', help='read from an archive file (--format archive) instead of the device')
+    parser.add_argument('-o', '--output', help='write to a file instead of stdout, compressed if it ends in .gz or .zst (needs zstandard)')
+    parser.add_argument('--stats', help='write command and stage timings to this file (Prometheus text if it ends in .prom, otherwise JSON, - for stderr)')
+    parser.add_argument('--format', choices=['csv', 'parquet', 'arrow', 'archive'], default='csv', help='parquet and arrow (IPC file) need -o and pyarrow, archive (delta encoded, see xc0424/archive.py) needs -o')
+    parser.add_argument('--store', metavar='DIR', help='only export the blocks not already in the block store in DIR (ie new since the last export) and add them to it')
+    parser.add_argument('--from', dest='start', type=datetime.datetime.fromisoformat, help='only samples from this time (logger time, eg 2023-05-17T14:00)')
+    parser.add_argument('--to', dest='end', type=datetime.datetime.fromisoformat, help='only samples before this time')
+    args = parser.parse_args()
+    if args.format != 'csv' and args.output in (None, '-'):
+        parser.error('--format %s needs -o' % args.format)
+    if args.store and (args.start or args.end):
+        # The store keeps whole blocks, a block cut down to the range would look like a new one
+        parser.error('--store can not be used with --from or --to')
+
+    stats = Stats() if args.stats else None
     try:
-        device.write(ep_out.bEndpointAddress, pkt)
-    except usb.core.USBError as e:
+        if args.archive:
+            source = open_archive(args.archive)
+        else:
+            source = open_source(args.image, stats, args.cache)
+    except ValueError as e:
         sys.exit(str(e))
+    if args.archive:
+        serial = source.serial_str
+        blocks = source.read_blocks(args.start, args.end)
+    else:
+        serial = read_serial(source)
+        # Oldest first (cyclic mode wraps around) and only the blocks in the range
+        blocks = read_blocks_in_order(source, args.start, args.end)
+
+    store = None
+    if args.store:
+        store = BlockStore.open(args.store, serial)
+        blocks = store.new_blocks(blocks)
+
+    if args.format == 'archive':
+        with ArchiveWriter(args.output, serial) as archive:
+            archive.write_blocks(blocks, stats)
+    elif args.format != 'csv':
+        try:
+            write_arrow(args.output, serial, blocks, args.format, stats)
+        except ImportError as e:
+            sys.exit(str(e))
+    else:
+        try:
+            out = open_output(args.output)
+        except ImportError as e:
+            sys.exit(str(e))
+        try:
+            write_csv(out, blocks, stats)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    if store is not None:
+        # Only once they have been written
+        store.commit()
+    if args.cache and not (args.image or args.archive):
+        source.save()
+    if stats:
+        write_stats(stats, args.stats)
 
+if __name__ == '__main__':
     try:
-        data = bytes(device.read(ep_in.bEndpointAddress, ep_in.wMaxPacketSize))
-        datasize = data[1]
-        #print(data[:datasize+2].hex(' '))
-        return data[2:datasize+1]
-    except usb.core.USBError as e:
+        main()
+    except TransportError as e:
         sys.exit(str(e))
-
-def print_humtemp(humtemp, st, interval):
-    y = 0
-    while y < len(humtemp):
-        print(f'{st:%Y-%m-%dT%H:%M:%S}', end='')
-        print(',', end='')
-        # Need to take 20 because 0 in data allows for -20 offset
-        print(int(humtemp[y]) - 20, end='')
-        print(',', end='')
-        y += 1
-        # Need to take 500 from temp because 0 in data is -40.0C plus -10.0C offset
-        temp = ((int(humtemp[y]) * 0x100) + (int(humtemp[y+1]) - 500)) / 10
-        print(temp, sep='', end='')
-        print(',', end='')
-        temp = temp * 9 / 5 + 32
-        print(f'{temp:0.1f}', sep='')
-        y += 2
-        time_change = datetime.timedelta(seconds=interval)
-        st += time_change
-    return st
-
-def date_hex(datedec):
-    datehex = int((((datedec & 0xf0)/16)*10) + (datedec & 0x0f))
-    return datehex
-
-def main():
-    dev = find_device(0x10C4, 0x8468)
-
-    # Possibly initialise
-    response = send_command(dev, '01 00 00 02 02')
-    if response[0] == 0x55:
-        response = send_command(dev, '01 00 00 02 02')
-
-    print("YYYY-MM-DDTHH:MM:SS,HUM_%,TEMP_C,TEMP_F")
-    # Read data map
-    map = 0x0058
-    dateptr = 0x019c
-    dataptr = 0x0d00
-    while (map < 0x019c):
-        #print ()
-        mapread = f'01 00 %04x 1b' % map
-        response = bytes(send_command(dev, mapread))
-        #print(response.hex(' '))
-        map += 0x1b
-        mapptr = 0
-        while (mapptr < 0x1b):
-            mapdata = response[mapptr]
-            if (mapdata != 0xff):
-                mapoff = mapdata + 1;
-                dateread = f'01 00 %04x 08' % dateptr
-                datadate = send_command(dev, dateread)
-
-                st_year = date_hex(datadate[0]) + 2000
-                st_month = date_hex(datadate[1])
-                st_day = date_hex(datadate[2])
-                st_hour = date_hex(datadate[3])
-                st_minute = date_hex(datadate[4])
-                st_second = date_hex(datadate[5])
-
-                starttime = datetime.datetime( st_year, st_month, st_day, st_hour, st_minute, st_second )
-                interval = (int(datadate[6]) * 0x100) + int(datadate[7])
-
-                dataoff = dataptr
-                for x in range(int(mapoff * 3 / 0x27)):
-                    dataread = f'01 00 %04x 27' % dataoff
-                    datadata = send_command(dev, dataread)
-                    starttime = print_humtemp(datadata, starttime, interval)
-                    dataoff += 0x27
-                if (((mapoff * 3) % 0x27) > 0):
-                    dataread = f'01 00 %04x %02x' % (dataoff, ((mapoff * 3) % 0x27))
-                    datadata = send_command(dev, dataread)
-                    print_humtemp(datadata, starttime, interval)
-            mapptr += 1
-            dateptr += 8
-            dataptr += (0x40 * 3)
-
-if __name__ == '__main__':
-    main()
-
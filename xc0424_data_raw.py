@@ -1,112 +1,73 @@
 #!/bin/env python
-import array
+import argparse
 import sys
-import usb.core
-import usb.util
-from datetime import datetime
+from xc0424.blocks import used_blocks, MAP_START, BLOCKS, HEADER_START, HEADER_SIZE, DATA_START, BLOCK_SIZE
+from xc0424.image import open_source
+from xc0424.index import BlockIndex
+from xc0424.errors import TransportError
+
+
+def print_sorted(dev):
+    index = BlockIndex(dev)
+    for row in range(0, BLOCKS, 0x1b):
+        print(f'{MAP_START + row:04x}  ',end='')
+        print(index.map[row:row + 0x1b].hex(' '))
+    # One block read at a time, in the order the logger wrote them
+    for starttime, endtime, block, interval, count in index.entries:
+        dateptr = HEADER_START + block * HEADER_SIZE
+        print(f'{dateptr:04x}  ',end='')
+        print(index.headers[block * HEADER_SIZE:(block + 1) * HEADER_SIZE].hex(' '))
+        dataptr = DATA_START + block * BLOCK_SIZE
+        datadata = dev.read_memory(dataptr, count * 3)
+        for dataoff in range(0, count * 3, 0x27):
+            print(f'{dataptr + dataoff:04x}  ',end='')
+            print(datadata[dataoff:dataoff + 0x27].hex(' '))
 
-def find_device(VID, PID):
-    device = usb.core.find(idVendor = VID, idProduct = PID)
-
-    if device is None:
-        sys.exit("Could not find device.")
-
-    try:
-        if device.is_kernel_driver_active(0):
-            device.detach_kernel_driver(0)
-    except usb.core.USBError as e:
-        sys.exit("Could not detach kernel driver: %s" % str(e))
-    except NotImplementedError:
-        # This is not a thing on Windows so ignore the error
-        pass
-
-    try:
-        device.reset()
-        device.set_configuration()
-    except usb.core.USBError as e:
-        sys.exit("Could not set configuration: %s" % str(e))
-    return device
-
-
-def send_command(device, command):
-    # access the first configuration
-    # cfg = device[0]
-    # access the first interface
-    # intf = cfg[(0,0)]
-    # second endpoint
-    # ep = intf[1]
-    ep_in = device[0][(0,0)][0]
-    ep_out = device[0][(0,0)][1]
-
-    pkt = bytearray.fromhex(command)
-    pkt.append(sum(pkt) & 0xFF)
-    pkt = bytearray([ 0x02, len(pkt) & 0xff ]) + pkt
-    #print (bytes(pkt).hex(' '), ' =>  ', end='', flush=True)
-    pkt = pkt + array.array('B',(0,)*(ep_out.wMaxPacketSize-len(pkt)))
-
-    try:
-        device.write(ep_out.bEndpointAddress, pkt)
-    except usb.core.USBError as e:
-        sys.exit(str(e))
+def main():
+    parser = argparse.ArgumentParser(description='Print the raw XC-0424 memory')
+    parser.add_argument('--image', help='read from a snapshot image (xc0424_snapshot.py) instead of the device')
+    parser.add_argument('--sorted', action='store_true', help='print the map then the blocks oldest first instead of in memory order')
+    args = parser.parse_args()
 
     try:
-        data = bytes(device.read(ep_in.bEndpointAddress, ep_in.wMaxPacketSize))
-        datasize = data[1]
-        #print(data[:datasize+2].hex(' '))
-        return data[2:datasize+1]
-    except usb.core.USBError as e:
+        dev = open_source(args.image)
+    except ValueError as e:
         sys.exit(str(e))
 
-
-def main():
-    dev = find_device(0x10C4, 0x8468)
-
-    # Possibly initialise
-    response = send_command(dev, '01 00 00 02 02')
-    if response[0] == 0x55:
-        response = send_command(dev, '01 00 00 02 02')
-
     # Read configuration
-    #response = send_command(dev, '01 00 00 05 0a')
+    #response = dev.read_memory(CONFIG_ADDR, 10)
     #print(response.hex(' '))
 
-    # Read data map
-    map = 0x0058
-    dateptr = 0x019c
-    dataptr = 0x0d00
-    while (map < 0x019c):
-        #print ()
-        mapread = f'01 00 %04x 1b' % map
-        response = bytes(send_command(dev, mapread))
-        print(f'{map:04x}  ',end='')
-        print(response.hex(' '))
-        map += 0x1b
-        mapptr = 0
-        while (mapptr < 0x1b):
-            mapdata = response[mapptr]
-            if (mapdata != 0xff):
+    if args.sorted:
+        print_sorted(dev)
+        return
+
+    # Read the whole data map, then the block headers up to the last used block
+    map = dev.read_memory(MAP_START, BLOCKS)
+    used = used_blocks(map)
+    if used:
+        headers = dev.read_memory(HEADER_START, (used[-1] + 1) * HEADER_SIZE)
+
+    # Print it in the same rows as the map is read (0x1b) and the data is read (0x27)
+    for row in range(0, BLOCKS, 0x1b):
+        print(f'{MAP_START + row:04x}  ',end='')
+        print(map[row:row + 0x1b].hex(' '))
+        for block in range(row, row + 0x1b):
+            if (map[block] != 0xff):
                 #print ()
-                mapoff = mapdata + 1;
-                dateread = f'01 00 %04x 08' % dateptr
-                datadate = send_command(dev, dateread)
+                mapoff = map[block] + 1
+                dateptr = HEADER_START + block * HEADER_SIZE
                 print(f'{dateptr:04x}  ',end='')
-                print(datadate.hex(' '))
-                dataoff = dataptr
-                for x in range(int(mapoff * 3 / 0x27)):
-                    dataread = f'01 00 %04x 27' % dataoff
-                    datadata = send_command(dev, dataread)
-                    print(f'{dataoff:04x}  ',end='')
-                    print(datadata.hex(' '))
-                    dataoff += 0x27
-                if (((mapoff * 3) % 0x27) > 0):
-                    dataread = f'01 00 %04x %02x' % (dataoff, ((mapoff * 3) % 0x27))
-                    datadata = send_command(dev, dataread)
-                    print(f'{dataoff:04x}  ',end='')
-                    print(datadata.hex(' '))
-            mapptr += 1
-            dateptr += 8
-            dataptr += (0x40 * 3)
+                print(headers[block * HEADER_SIZE:(block + 1) * HEADER_SIZE].hex(' '))
+                dataptr = DATA_START + block * BLOCK_SIZE
+                datadata = dev.read_memory(dataptr, mapoff * 3)
+                for dataoff in range(0, mapoff * 3, 0x27):
+                    print(f'{dataptr + dataoff:04x}  ',end='')
+                    print(datadata[dataoff:dataoff + 0x27].hex(' '))
 
 if __name__ == '__main__':
-    main()
+    try:
+        main()
+    except TransportError as e:
+        sys.exit(str(e))
 
@@ -0,0 +1,44 @@
+#!/bin/env python
+import argparse
+import datetime
+import os
+import sys
+from xc0424.db import open_db_readonly, rollups, summary
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description='Hourly or daily minimum, mean and maximum from a database made by xc0424_data_sql.py')
+    parser.add_argument('db', help='database (xc0424_XXXXXXXX.db)')
+    parser.add_argument('--serial', help='logger (default the only one in the database)')
+    parser.add_argument('--period', choices=['hour', 'day'], default='day', help='one row per hour or day (default day)')
+    parser.add_argument('--from', dest='start', type=datetime.datetime.fromisoformat, help='from this time (logger time, eg 2023-05-17T14:00)')
+    parser.add_argument('--to', dest='end', type=datetime.datetime.fromisoformat, help='up to this time')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit('No database ' + args.db)
+    serial = args.serial
+    try:
+        db = open_db_readonly(args.db)
+    except ValueError as e:
+        sys.exit(str(e))
+    if serial is None:
+        serials = [row[0] for row in db.execute('SELECT DISTINCT serial FROM rollup_day')]
+        if len(serials) != 1:
+            sys.exit('--serial is needed, the database has ' + (', '.join(serials) or 'no loggers'))
+        serial = serials[0]
+
+    print('YYYY-MM-DDTHH:MM:SS,COUNT,HUM_MIN,HUM_MEAN,HUM_MAX,TEMP_C_MIN,TEMP_C_MEAN,TEMP_C_MAX')
+    for bucket, count, hum_mean, hum_min, hum_max, temp_mean, temp_min, temp_max in rollups(db, serial, args.period, args.start, args.end):
+        time = EPOCH + datetime.timedelta(seconds=bucket)
+        print('%s,%d,%d,%.1f,%d,%.1f,%.2f,%.1f' % (time.isoformat(), count, hum_min, hum_mean, hum_max, temp_min, temp_mean, temp_max))
+
+    if args.start and args.end:
+        # Exactly the samples in the range, not just the whole hours or days
+        count, hum_mean, hum_min, hum_max, temp_mean, temp_min, temp_max = summary(db, serial, args.start, args.end)
+        if count:
+            print('%s,%d,%d,%.1f,%d,%.1f,%.2f,%.1f' % ('all', count, hum_min, hum_mean, hum_max, temp_min, temp_mean, temp_max))
+
+if __name__ == '__main__':
+    main()
@@ -1,154 +1,85 @@
 #!/bin/env python
-import array
-import sys
-import usb.core
-import usb.util
+import argparse
 import datetime
-import sqlite3
-
-def find_device(VID, PID):
-    device = usb.core.find(idVendor = VID, idProduct = PID)
-
-    if device is None:
-        sys.exit("Could not find device.")
-
-    try:
-        if device.is_kernel_driver_active(0):
-            device.detach_kernel_driver(0)
-    except usb.core.USBError as e:
-        sys.exit("Could not detach kernel driver: %s" % str(e))
-    except NotImplementedError:
-        # This is not a thing on Windows so ignore the error
-        pass
-
-    try:
-        device.reset()
-        device.set_configuration()
-    except usb.core.USBError as e:
-        sys.exit("Could not set configuration: %s" % str(e))
-    return device
-
-
-def send_command(device, command):
-    # access the first configuration
-    # cfg = device[0]
-    # access the first interface
-    # intf = cfg[(0,0)]
-    # second endpoint
-    # ep = intf[1]
-    ep_in = device[0][(0,0)][0]
-    ep_out = device[0][(0,0)][1]
+import sys
+from xc0424.image import open_source, read_serial
+from xc0424.db import open_db, sync, sync_pipelined, load_range, load_blocks, BATCH_ROWS, BATCH_SECONDS
+from xc0424.archive import open_archive
+from xc0424.blockstore import BlockStore
+from xc0424.index import read_blocks_in_order
+from xc0424.profile import Stats, write_stats
+from xc0424.errors import TransportError
 
-    pkt = bytearray.fromhex(command)
-    pkt.append(sum(pkt) & 0xFF)
-    pkt = bytearray([ 0x02, len(pkt) & 0xff ]) + pkt
-    #print (bytes(pkt).hex(' '), ' =>  ', end='', flush=True)
-    pkt = pkt + array.array('B',(0,)*(ep_out.wMaxPacketSize-len(pkt)))
-
-    try:
-        device.write(ep_out.bEndpointAddress, pkt)
-    except usb.core.USBError as e:
-        sys.exit(str(e))
 
+def main():
+    parser = argparse.ArgumentParser(description='Read the XC-0424 data into a sqlite3 database')
+    parser.add_argument('--full', action='store_true', help='read every block instead of only the ones newer than the last run')
+    parser.add_argument('--pipeline', action='store_true', help='read the logger and write the database at the same time, committing in batches')
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS, help='with --pipeline commit every this many samples (default %d)' % BATCH_ROWS)
+    parser.add_argument('--batch-seconds', type=float, default=BATCH_SECONDS, help='or this often (default %s seconds)' % BATCH_SECONDS)
+    parser.add_argument('--stats', help='write command and stage timings to this file (Prometheus text if it ends in .prom, otherwise JSON, - for stderr)')
+    parser.add_argument('--cache', metavar='DIR', help='keep the block headers in DIR and only read the ones of blocks that have changed (not in cyclic mode, where any block can be overwritten)')
+    parser.add_argument('--image', help='read from a snapshot image (xc0424_snapshot.py) instead of the device')
+    parser.add_argument('--archive', help='add the samples of an archive file (xc0424_data_csv.py --format archive)')
+    parser.add_argument('--store', metavar='DIR', help='only add the blocks not already in the block store in DIR (eg from an earlier snapshot) and add them to it')
+    parser.add_argument('--from', dest='start', type=datetime.datetime.fromisoformat, help='only read samples from this time (logger time, eg 2023-05-17T14:00)')
+    parser.add_argument('--to', dest='end', type=datetime.datetime.fromisoformat, help='only read samples before this time')
+    args = parser.parse_args()
+    if args.store and (args.start or args.end):
+        # The store keeps whole blocks, a block cut down to the range would look like a new one
+        parser.error('--store can not be used with --from or --to')
+
+    stats = Stats() if args.stats else None
     try:
-        data = bytes(device.read(ep_in.bEndpointAddress, ep_in.wMaxPacketSize))
-        datasize = data[1]
-        #print(data[:datasize+2].hex(' '))
-        return data[2:datasize+1]
-    except usb.core.USBError as e:
+        if args.archive:
+            source = open_archive(args.archive)
+        else:
+            source = open_source(args.image, stats, args.cache)
+    except ValueError as e:
         sys.exit(str(e))
-
-def insert_humtemp(cur, humtemp, st, interval):
-    y = 0
-    while y < len(humtemp):
-        datadate = f'\'{st:%Y-%m-%d %H:%M:%S}\''
-        # Need to take 20 because 0 in data allows for -20 offset
-        humid = int(humtemp[y]) - 20
-        y += 1
-        # Need to take 500 from temp because 0 in data is -40.0C plus -10.0C offset
-        temp = ((int(humtemp[y]) * 0x100) + (int(humtemp[y+1]) - 500)) / 10
-        y += 2
-
-        cur.execute('SELECT * FROM data WHERE (datatime=? AND humidity=? AND temperature_C=?)', (datadate, humid, temp))
-        entry = cur.fetchone()
-        if entry is None:
-            cur.execute('INSERT INTO data (datatime, humidity, temperature_C) VALUES (?,?,?)', (datadate, humid, temp))
-            print('Inserting ',datadate, humid, temp)
-
-        time_change = datetime.timedelta(seconds=interval)
-        st += time_change
-    return st
-
-def date_hex(datedec):
-    datehex = int((((datedec & 0xf0)/16)*10) + (datedec & 0x0f))
-    return datehex
-
-def main():
-    dev = find_device(0x10C4, 0x8468)
-
-    # Possibly initialise
-    response = send_command(dev, '01 00 00 02 02')
-    if response[0] == 0x55:
-        response = send_command(dev, '01 00 00 02 02')
-
-    # Read configuration
-    response = send_command(dev, '01 00 00 05 0a')
-    #print(response.hex(' '))
-
-    # Not sure what the first 4 bytes of the returned configuration are. They are always the same but vary between monitors. Assuming serial number.
-    serial = f'{response[0]:02X}' + f'{response[1]:02X}' + f'{response[2]:02X}' + f'{response[3]:02X}'
+    if args.archive:
+        serial = source.serial_str
+    else:
+        # Read configuration (same as 01 00 00 05 0a) for the serial number
+        serial = read_serial(source)
 
     #db_name = 'xc0424_' + datetime.datetime.now().strftime('%Y%m%d%H%M%S') + '.db'
     db_name = 'xc0424_' + serial + '.db'
-    db = sqlite3.connect(db_name)
-    cursor = db.cursor()
-    res = cursor.execute("CREATE TABLE IF NOT EXISTS data (datatime DATETIME, humidity INTEGER, temperature_C FLOAT)")
-    db.commit()
-
-    print("Scanning for new data")
-    # Read data map
-    map = 0x0058
-    dateptr = 0x019c
-    dataptr = 0x0d00
-    while (map < 0x019c):
-        #print ()
-        mapread = f'01 00 %04x 1b' % map
-        response = bytes(send_command(dev, mapread))
-        #print(response.hex(' '))
-        map += 0x1b
-        mapptr = 0
-        while (mapptr < 0x1b):
-            mapdata = response[mapptr]
-            if (mapdata != 0xff):
-                mapoff = mapdata + 1;
-                dateread = f'01 00 %04x 08' % dateptr
-                datadate = send_command(dev, dateread)
-
-                st_year = date_hex(datadate[0]) + 2000
-                st_month = date_hex(datadate[1])
-                st_day = date_hex(datadate[2])
-                st_hour = date_hex(datadate[3])
-                st_minute = date_hex(datadate[4])
-                st_second = date_hex(datadate[5])
-
-                starttime = datetime.datetime( st_year, st_month, st_day, st_hour, st_minute, st_second )
-                interval = (int(datadate[6]) * 0x100) + int(datadate[7])
-
-                dataoff = dataptr
-                for x in range(int(mapoff * 3 / 0x27)):
-                    dataread = f'01 00 %04x 27' % dataoff
-                    datadata = send_command(dev, dataread)
-                    starttime = insert_humtemp(cursor, datadata, starttime, interval)
-                    db.commit()
-                    dataoff += 0x27
-                if (((mapoff * 3) % 0x27) > 0):
-                    dataread = f'01 00 %04x %02x' % (dataoff, ((mapoff * 3) % 0x27))
-                    datadata = send_command(dev, dataread)
-                    starttime = insert_humtemp(cursor, datadata, starttime, interval)
-                    db.commit()
-            mapptr += 1
-            dateptr += 8
-            dataptr += (0x40 * 3)
+    try:
+        db = open_db(db_name, serial)
+    except ValueError as e:
+        sys.exit(db_name + ': ' + str(e))
+
+    if args.store:
+        store = BlockStore.open(args.store, serial)
+        print("Reading blocks not in", store.path)
+        if args.archive:
+            blocks = source.read_blocks()
+        else:
+            blocks = read_blocks_in_order(source)
+        inserted = load_blocks(db, serial, store.new_blocks(blocks), stats)
+        # Only once they are in the database
+        store.commit()
+    elif args.archive:
+        print("Reading", args.archive)
+        inserted = load_blocks(db, serial, source.read_blocks(args.start, args.end), stats)
+    elif args.start or args.end:
+        print("Reading", args.start or 'start', "to", args.end or 'end')
+        inserted = load_range(db, source, serial, args.start, args.end, stats)
+    else:
+        print("Scanning for new data")
+        if args.pipeline:
+            inserted = sync_pipelined(db, source, serial, args.full, stats, args.batch_rows, args.batch_seconds)
+        else:
+            inserted = sync(db, source, serial, args.full, stats)
+    print('Inserted', inserted, 'samples')
+    if args.cache and not (args.image or args.archive):
+        source.save()
+    if stats:
+        write_stats(stats, args.stats)
 
 if __name__ == '__main__':
-    main()
+    try:
+        main()
+    except TransportError as e:
+        sys.exit(str(e))
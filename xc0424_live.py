@@ -0,0 +1,37 @@
+#!/bin/env python
+import argparse
+import sys
+from xc0424.transport import find_device, Transport
+from xc0424.image import read_serial
+from xc0424.live import Ring, Poller, serve
+from xc0424.errors import TransportError
+
+def main():
+    parser = argparse.ArgumentParser(description='Poll the XC-0424 current reading and serve it over HTTP')
+    parser.add_argument('--interval', type=float, default=5.0, help='seconds between readings (default 5)')
+    parser.add_argument('--size', type=int, default=17280, help='readings kept (default 17280, a day at 5 seconds)')
+    parser.add_argument('--bind', default='127.0.0.1', help='address to listen on (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8424, help='port to listen on (default 8424)')
+    args = parser.parse_args()
+
+    dev = Transport(find_device())
+    # Possibly initialise
+    dev.initialise()
+    serial = read_serial(dev)
+
+    poller = Poller(dev, Ring(args.size), args.interval)
+    server = serve(poller, (args.bind, args.port), serial)
+    poller.start()
+    print('Serving', serial, 'on http://%s:%d/latest' % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    poller.stop()
+    server.server_close()
+
+if __name__ == '__main__':
+    try:
+        main()
+    except TransportError as e:
+        sys.exit(str(e))
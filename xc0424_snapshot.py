@@ -0,0 +1,31 @@
+#!/bin/env python
+import argparse
+import sys
+from datetime import datetime
+from xc0424.transport import find_device, Transport
+from xc0424.image import snapshot, read_serial
+from xc0424.errors import TransportError
+
+def main():
+    parser = argparse.ArgumentParser(description='Read the XC-0424 memory once into an image file for the data scripts (--image)')
+    parser.add_argument('image', nargs='?', help='image file name (default xc0424_<serial>_<YYYYMMDDHHMMSS>.img)')
+    args = parser.parse_args()
+
+    dev = Transport(find_device())
+    # Possibly initialise
+    dev.initialise()
+    # A failed snapshot is kept here and picked up by the next one
+    checkpoint = 'xc0424_' + read_serial(dev) + '.part'
+    image = snapshot(dev, checkpoint)
+
+    path = args.image
+    if path is None:
+        path = 'xc0424_' + image.serial_str + '_' + datetime.fromtimestamp(image.read_time).strftime('%Y%m%d%H%M%S') + '.img'
+    image.write(path)
+    print(path)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except TransportError as e:
+        sys.exit(str(e))